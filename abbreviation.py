@@ -0,0 +1,121 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import logging
+import re
+
+K_MEMO_SIZE = 1024
+K_TRUNCATION = '.'
+
+
+class AbbreviationTable:
+    '''Abbreviations compiled into a single regular expression, replaced in one pass'''
+    def __init__(self, _abbreviations: dict):
+        self.m_Abbreviations = dict(_abbreviations)
+        self.m_Pattern = None
+
+        if len(self.m_Abbreviations) != 0:
+            #The longest key first, so 'Terminal ' is matched before 'Term'
+            allKey = sorted(self.m_Abbreviations, key=len, reverse=True)
+            self.m_Pattern = re.compile('|'.join(re.escape(key) for key in allKey))
+
+    def Apply(self, _value: str):
+        if self.m_Pattern == None:
+            return _value
+        return self.m_Pattern.sub(lambda match: self.m_Abbreviations[match.group(0)], _value)
+
+
+class GlyphMetrics:
+    '''Width of a text measured from the advance of each character, cached per character'''
+    def __init__(self, _font):
+        '''
+        :param _font: ImageFont the text is drawn with.
+        '''
+        self.m_Font = _font
+        self.m_Advances = {}
+
+    def GetWidth(self, _text: str):
+        '''
+        :return: width in pixel of _text, without kerning so never smaller than the drawn text in practice
+        '''
+        width = 0.0
+        for character in _text:
+            advance = self.m_Advances.get(character)
+            if advance == None:
+                #getlength needs Pillow 8.0, Raspbian Buster ships Pillow 5.4
+                advance = self.m_Font.getlength(character) if hasattr(self.m_Font, 'getlength') else self.m_Font.getsize(character)[0]
+                self.m_Advances[character] = advance
+            width += advance
+        return width
+
+
+class Abbreviator:
+    '''
+    Abbreviate the station names with the abbreviation of config.json, then, if a width is set,
+    with the aggressive abbreviations, one level after the other, only until the name fits.
+    '''
+    def __init__(self, _abbreviations: dict, _aggressiveAbbreviations: list):
+        '''
+        :param _abbreviations: 'abbreviation' part of config.json, always applied.
+        :param _aggressiveAbbreviations: 'aggressiveAbbreviation' part of config.json, list of abbreviations from the least to the most aggressive.
+        '''
+        self.m_Table = AbbreviationTable(_abbreviations)
+        self.m_AggressiveTables = [AbbreviationTable(abbreviations) for abbreviations in _aggressiveAbbreviations]
+
+        self.m_Metrics = None
+        self.m_MaxWidth = 0.0
+        self.m_Memo = {} #(name, prefix) -> abbreviated name
+
+    def SetFitting(self, _metrics: GlyphMetrics, _maxWidth: float):
+        '''
+        Fit the names in a width.
+        :param _metrics: metrics of the font the names are drawn with.
+        :param _maxWidth: width in pixel available for the prefix and the name.
+        :return: None
+        '''
+        self.m_Metrics = _metrics
+        self.m_MaxWidth = _maxWidth
+        self.m_Memo.clear()
+
+    def Abbreviate(self, _value: str, _prefix: str = ''):
+        '''
+        :param _value: name to abbreviate.
+        :param _prefix: text drawn before the name on the same line, only used to fit the name.
+        :return: the abbreviated name
+        '''
+        key = (_value, _prefix)
+        result = self.m_Memo.get(key)
+        if result == None:
+            result = self.m_Table.Apply(_value)
+            if self.m_Metrics != None:
+                result = self.Fit(result, self.m_MaxWidth - self.m_Metrics.GetWidth(_prefix))
+
+            if len(self.m_Memo) >= K_MEMO_SIZE:
+                self.m_Memo.clear()
+            self.m_Memo[key] = result
+        return result
+
+    def Fit(self, _value: str, _width: float):
+        '''
+        Apply the aggressive abbreviations until the name fits, truncate it if it's still too long.
+        :return: the name fitting in _width
+        '''
+        for table in self.m_AggressiveTables:
+            if self.m_Metrics.GetWidth(_value) <= _width:
+                return _value
+            _value = table.Apply(_value)
+
+        if self.m_Metrics.GetWidth(_value) <= _width:
+            return _value
+
+        availableWidth = _width - self.m_Metrics.GetWidth(K_TRUNCATION)
+        width = 0.0
+        length = 0
+        for character in _value:
+            width += self.m_Metrics.GetWidth(character)
+            if width > availableWidth:
+                break
+            length += 1
+
+        logging.debug("{} truncated to fit {:.0f} pixels".format(_value, _width))
+        return _value[:max(1, length)].rstrip() + K_TRUNCATION
@@ -0,0 +1,94 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+
+
+class AsyncRuntime:
+    '''
+    Run the update cycles on an asyncio event loop: the e-Paper refresh of a frame overlaps
+    the requests and the drawing of the next ones, instead of blocking them for seconds.
+    The stages of all the stations run in one worker thread, as they share the station graph and the caches.
+    The e-Paper refresh runs in its own thread and always displays the latest frame drawn.
+    '''
+    def __init__(self, _manager):
+        '''
+        :param _manager: DepartureManager or MultiStationManager to run.
+        '''
+        self.m_Manager = _manager
+        self.m_StageExecutor = ThreadPoolExecutor(1, 'Stages')
+        self.m_DisplayExecutor = ThreadPoolExecutor(1, 'Display')
+
+        self.m_PendingFrames = {} #DepartureManager -> (frame Image, next refresh delay), replaced by a newer frame
+        self.m_FrameEvent = None
+
+    def Run(self):
+        '''
+        Run the update cycles until an exception is raised.
+        :return: None
+        '''
+        asyncio.run(self.Main())
+
+    async def Main(self):
+        self.m_FrameEvent = asyncio.Event()
+        await asyncio.gather(self.UpdateLoop(), self.DisplayLoop())
+
+    async def UpdateLoop(self):
+        '''
+        Run the due stages in the worker thread, hand the frames over to the display loop
+        and sleep until the next scheduled job.
+        '''
+        loop = asyncio.get_running_loop()
+        while True:
+            allFrame = await loop.run_in_executor(self.m_StageExecutor, self.RunCycle)
+
+            #The worker thread is idle, the schedulers can be read from the event loop
+            for station, frameImage in allFrame:
+                self.m_PendingFrames[station] = (frameImage, station.GetNextUpdateDelay())
+                self.m_FrameEvent.set()
+
+            delay = self.m_Manager.GetNextUpdateDelay()
+            logging.info("Next update in {} seconds\n\n\n\n".format(delay))
+            await asyncio.sleep(delay)
+
+    async def DisplayLoop(self):
+        '''
+        Display the pending frames in the display thread, a frame drawn during a refresh replaces the older pending one.
+        '''
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.m_FrameEvent.wait()
+            self.m_FrameEvent.clear()
+
+            while len(self.m_PendingFrames) != 0:
+                station, (frameImage, nextRefreshDelay) = self.m_PendingFrames.popitem()
+                await loop.run_in_executor(self.m_DisplayExecutor, station.DisplayFrame, frameImage, nextRefreshDelay)
+
+    def RunCycle(self):
+        '''
+        Run the due stages of each station, in the worker thread.
+        :return: list of (DepartureManager, frame Image) of the frames drawn
+        '''
+        allFrame = []
+        with tracing.Cycle():
+            for station in self.m_Manager.GetStations():
+                with tracing.Span('Station', station=station.transportRequest.m_StationCode):
+                    frameImage = station.RunDueStages()
+                if frameImage != None:
+                    allFrame.append((station, frameImage))
+        self.m_Manager.m_Services.Flush()
+        return allFrame
+
+    def Close(self):
+        '''
+        Wait for the running stages and e-Paper refresh, then release the resources of the manager.
+        :return: None
+        '''
+        #Each executor runs at most one job, awaited by the event loop, so there is no pending job to cancel
+        self.m_StageExecutor.shutdown(wait=True)
+        self.m_DisplayExecutor.shutdown(wait=True)
+        self.m_Manager.Close()
@@ -0,0 +1,78 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+'''
+Compare the packing of the e-Paper frame buffer with the former per-pixel loop, in both orientations.
+Usage, from anywhere: python benchmark/bench_epd_buffer.py [--iterations 5]
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PIL import Image
+
+from lib import epdbuffer
+
+K_WIDTH = 648
+K_HEIGHT = 480
+
+def LegacyGetBuffer(_image, _width, _height):
+    '''Former EPD.getbuffer, pixel per pixel'''
+    buf = [0xFF] * (int(_width/8) * _height)
+    image_monocolor = _image.convert('1')
+    imwidth, imheight = image_monocolor.size
+    pixels = image_monocolor.load()
+    if(imwidth == _width and imheight == _height):
+        for y in range(imheight):
+            for x in range(imwidth):
+                if pixels[x, y] == 0:
+                    buf[int((x + y * _width) / 8)] &= ~(0x80 >> (x % 8))
+    elif(imwidth == _height and imheight == _width):
+        for y in range(imheight):
+            for x in range(imwidth):
+                newx = y
+                newy = _height - x - 1
+                if pixels[x, y] == 0:
+                    buf[int((newx + newy*_width) / 8)] &= ~(0x80 >> (y % 8))
+    return buf
+
+def LegacyInvert(_buffer):
+    '''Former inversion of EPD.display, as sent on the SPI bus'''
+    return [(~value) & 0xFF for value in _buffer]
+
+def CreateImage(_size):
+    random.seed(0)
+    image = Image.new('L', _size, 255)
+    image.putdata([random.choice((0, 255)) for _ in range(_size[0] * _size[1])])
+    return image
+
+def Measure(_function, _iterations: int):
+    startTime = time.perf_counter()
+    for _ in range(_iterations):
+        _function()
+    return (time.perf_counter() - startTime) / _iterations * 1000.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=5)
+    iterations = parser.parse_args().iterations
+
+    for orientation, size in (('vertical', (K_WIDTH, K_HEIGHT)), ('horizontal', (K_HEIGHT, K_WIDTH))):
+        image = CreateImage(size)
+
+        legacyBuffer = LegacyGetBuffer(image, K_WIDTH, K_HEIGHT)
+        packedBuffer = epdbuffer.pack_image(image, K_WIDTH, K_HEIGHT)
+        assert bytes(legacyBuffer) == bytes(packedBuffer), "{} buffer differs from the legacy output".format(orientation)
+        assert bytes(LegacyInvert(legacyBuffer)) == epdbuffer.invert_buffer(packedBuffer), "{} inverted buffer differs".format(orientation)
+
+        legacyTime = Measure(lambda: LegacyInvert(LegacyGetBuffer(image, K_WIDTH, K_HEIGHT)), max(1, iterations // 5))
+        packedTime = Measure(lambda: epdbuffer.invert_buffer(epdbuffer.pack_image(image, K_WIDTH, K_HEIGHT)), iterations * 20)
+
+        print("{:<10} legacy {:9.2f} ms | packed {:7.3f} ms | x{:.0f}".format(orientation, legacyTime, packedTime, legacyTime / packedTime))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+'''
+Measure the e-Paper driver on the simulated panel, without hardware: bytes and transfers on the SPI bus,
+time waited on the busy pin and in the delays, and the Python time of each driver operation.
+The displayed frame is checked against the image sent.
+The init and the byte throughput of a display are compared with the former driver, which sent Python lists and one transfer per parameter byte.
+Usage, from anywhere: python benchmark/bench_epd_driver.py [--frame frame.png] [--spi-hz 4000000] [--iterations 20]
+'''
+
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+
+os.environ['EPD_BACKEND'] = 'simulated' #Before the driver import
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PIL import Image, ImageChops
+
+from lib import epdbuffer
+from lib import epdconfig
+from lib import epd5in83_V2
+
+
+class LegacyEPD(epd5in83_V2.EPD):
+    '''Former transfers of the driver: Python lists and one CS assertion per parameter byte'''
+    def send_command_data(self, command, data):
+        self.send_command(command)
+        for value in data:
+            self.send_data(value)
+
+    def display(self, image):
+        self.send_command(0x10)
+        self.send_data2([0x00] * int(self.width * self.height / 8))
+        self.send_command(0x13)
+        self.send_data2([(~value) & 0xFF for value in image])
+        self.TurnOnDisplay()
+
+def CreateImage(_size):
+    random.seed(0)
+    image = Image.new('L', _size, 255)
+    image.putdata([random.choice((0, 255)) for _ in range(_size[0] * _size[1])])
+    return image
+
+def RunOperation(_name: str, _operation):
+    '''
+    Run a driver operation on fresh counters of the simulated panel.
+    :return: (name, Python time in seconds, copy of the SimulatedStats of the operation)
+    '''
+    epdconfig.implementation.reset_stats()
+    startTime = time.perf_counter()
+    _operation()
+    pythonTime = time.perf_counter() - startTime
+    return _name, pythonTime, copy.copy(epdconfig.implementation.stats)
+
+def PrintResults(_allResult: list, _spiSpeed: int):
+    print("SPI clock {:.1f} MHz".format(_spiSpeed / 1e6))
+    print("{:<12}{:>11}{:>11}{:>10}{:>12}{:>12}{:>12}".format('operation', 'python', 'bytes', 'transfers', 'spi bus', 'busy', 'delays'))
+    for name, pythonTime, stats in _allResult:
+        print("{:<12}{:>8.2f} ms{:>11}{:>10}{:>9.1f} ms{:>9.1f} ms{:>9.1f} ms".format(
+              name, pythonTime * 1000.0, stats.data_bytes, stats.transfers,
+              stats.transfer_time * 1000.0, stats.busy_time * 1000.0, stats.delay_time * 1000.0))
+
+def MeasureOperation(_name: str, _operation, _iterations: int):
+    '''
+    :return: (name, fastest Python time in seconds, SimulatedStats) of the runs of an operation
+    '''
+    return min((RunOperation(_name, _operation) for _ in range(_iterations)), key=lambda result: result[1])
+
+def CompareDrivers(_legacyDriver, _bulkDriver, _buffer, _iterations: int):
+    '''
+    Run the init and the display of both drivers, the frame reaching the panel must be the same.
+    :return: list of (operation, [(driver name, Python time in seconds, SimulatedStats), ...])
+    '''
+    panel = epdconfig.implementation
+    allComparison = []
+    for operation in ('init', 'display'):
+        allResult = []
+        for name, driver in (('legacy', _legacyDriver), ('bulk', _bulkDriver)):
+            if operation == 'init':
+                allResult.append(MeasureOperation(name, driver.init, _iterations))
+            else:
+                allResult.append(MeasureOperation(name, lambda: driver.display(_buffer), _iterations))
+                assert panel.frame == epdbuffer.invert_buffer(_buffer), "{} frame differs".format(name)
+        allComparison.append((operation, allResult))
+    return allComparison
+
+def PrintComparison(_allComparison: list):
+    print("\n{:<12}{:<8}{:>11}{:>12}{:>11}{:>10}".format('operation', 'driver', 'python', 'throughput', 'bytes', 'transfers'))
+    for operation, allResult in _allComparison:
+        for name, pythonTime, stats in allResult:
+            print("{:<12}{:<8}{:>8.3f} ms{:>7.1f} MB/s{:>11}{:>10}".format(
+                  operation, name, pythonTime * 1000.0, stats.data_bytes / pythonTime / 1e6, stats.data_bytes, stats.transfers))
+        print("{:<12}bulk x{:.1f}".format('', allResult[0][1] / allResult[1][1]))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frame', help="save the frame displayed by the simulated panel")
+    parser.add_argument('--spi-hz', type=int, default=epdconfig.SPI_SPEED_HZ, help="SPI clock of the simulated bus")
+    parser.add_argument('--iterations', type=int, default=20)
+    arguments = parser.parse_args()
+
+    panel = epdconfig.implementation
+    panel.max_speed_hz = arguments.spi_hz
+    driver = epd5in83_V2.EPD()
+    image = CreateImage((driver.width, driver.height))
+
+    #Same sequence as utility.EPaperSession: a refresh from deep sleep, then one from light sleep
+    allResult = [RunOperation('init', driver.init),
+                 RunOperation('getbuffer', lambda: driver.getbuffer(image))]
+    buffer = driver.getbuffer(image)
+    allResult += [RunOperation('display', lambda: driver.display(buffer)),
+                  RunOperation('power_off', driver.power_off),
+                  RunOperation('power_on', driver.power_on),
+                  RunOperation('display', lambda: driver.display(buffer)),
+                  RunOperation('sleep', driver.sleep)]
+
+    PrintResults(allResult, panel.max_speed_hz)
+
+    frame = panel.get_frame()
+    assert frame != None, "No frame displayed by the simulated panel"
+    assert ImageChops.difference(frame.convert('L'), image.convert('1').convert('L')).getbbox() == None, "Displayed frame differs from the image"
+    print("displayed frame matches the image")
+
+    if arguments.frame != None:
+        frame.save(arguments.frame)
+
+    PrintComparison(CompareDrivers(LegacyEPD(), driver, buffer, arguments.iterations))
+
+if __name__ == "__main__":
+    main()
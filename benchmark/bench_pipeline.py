@@ -0,0 +1,138 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+'''
+Per-stage benchmark of the DepartureManager pipeline, without network and without display.
+The transport API is replayed from a corpus (synthetic by default) and the e-Paper stage runs the driver on the simulated panel,
+which only advances a virtual clock while the panel is busy.
+Usage, from anywhere: python benchmark/bench_pipeline.py [--iterations N] [--scenario wilmslow|piccadilly] [--corpus FILE]
+'''
+
+import argparse
+import copy
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+K_REPOSITORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+K_WORKING_DIRECTORY = os.getcwd()
+sys.path.insert(0, K_REPOSITORY)
+os.chdir(K_REPOSITORY) #Assets are loaded relatively to the repository
+os.environ['EPD_BACKEND'] = 'simulated' #Before the driver import
+
+import fixtures
+from departure_manager import DepartureManager
+from lib import epd5in83_V2
+
+EPaperDriver = None #Initialized once, as the e-Paper session keeps the panel awake between the refreshes
+
+def GetEPaperDriver():
+    global EPaperDriver
+    if EPaperDriver == None:
+        EPaperDriver = epd5in83_V2.EPD()
+        EPaperDriver.init()
+    return EPaperDriver
+
+
+def GetStages(_manager: DepartureManager):
+    '''
+    :return: list of (stage name, function) in the order of DepartureManager.Update
+    '''
+    frame = {}
+
+    def DrawStationMap():
+        _manager.m_StationMapRevision = None #Measure the drawing even if the graph has not changed
+        _manager.DrawStationMap()
+
+    def MergeImages():
+        frame['image'] = _manager.CreateFrameImage()
+
+    def DisplayFrame():
+        driver = GetEPaperDriver()
+        driver.display(driver.getbuffer(frame['image']))
+
+    return [('AgendaUpdate', _manager.AgendaUpdate),
+            ('DepartureRequests', _manager.DepartureRequests),
+            ('UpdateDepartures', _manager.UpdateDepartures),
+            ('FillNodeStation', _manager.FillNodeStation),
+            ('CreateDepartureImage', _manager.CreateDepartureImage),
+            ('DrawStationMap', DrawStationMap),
+            ('DrawTrainPosition', _manager.DrawTrainPosition),
+            ('MergeImages', MergeImages),
+            ('EPD.display', DisplayFrame)]
+
+def RunIteration(_config: dict, _results: dict, _traceMemory: bool):
+    '''
+    Run all the stages once on a new DepartureManager, as after a restart (the places cache is kept).
+    :param _results: stage name -> {'wall': [], 'cpu': [], 'peak': []}, filled with the measures
+    '''
+    manager = DepartureManager(copy.deepcopy(_config))
+
+    for name, stage in GetStages(manager):
+        result = _results.setdefault(name, {'wall': [], 'cpu': [], 'peak': []})
+
+        if _traceMemory:
+            #Restarted for each stage, tracemalloc.reset_peak needs Python 3.9
+            tracemalloc.start()
+            stage()
+            result['peak'].append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            continue
+
+        startWall = time.perf_counter()
+        startCpu = time.process_time()
+        stage()
+        result['cpu'].append(time.process_time() - startCpu)
+        result['wall'].append(time.perf_counter() - startWall)
+
+def RunScenario(_scenario: str, _iterations: int, _corpusFilename: str, _stationCode: str):
+    with tempfile.TemporaryDirectory() as directory:
+        if _corpusFilename == None:
+            _corpusFilename = os.path.join(directory, 'corpus.jsonl.gz')
+            _stationCode = fixtures.GenerateCorpus(_scenario, _corpusFilename)
+
+        config = fixtures.CreateConfig(_stationCode, _corpusFilename, directory)
+
+        results = {}
+        RunIteration(config, {}, False) #warm-up: places cache, fonts, imports
+        for _ in range(_iterations):
+            RunIteration(config, results, False)
+
+        RunIteration(config, results, True)
+
+    print("\n{} ({}) - {} iterations".format(_scenario, _stationCode, _iterations))
+    print("{:<22}{:>12}{:>12}{:>12}{:>14}".format('stage', 'wall mean', 'wall p50', 'cpu mean', 'peak memory'))
+    totalWall = 0.0
+    for name, result in results.items():
+        wallMean = statistics.mean(result['wall']) * 1000.0
+        totalWall += wallMean
+        print("{:<22}{:>9.2f} ms{:>9.2f} ms{:>9.2f} ms{:>10.0f} KiB".format(name, wallMean,
+                                                                         statistics.median(result['wall']) * 1000.0,
+                                                                         statistics.mean(result['cpu']) * 1000.0,
+                                                                         max(result['peak']) / 1024.0))
+    print("{:<22}{:>9.2f} ms".format('total', totalWall))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--scenario', choices=sorted(fixtures.K_SCENARIOS), action='append',
+                        help="synthetic scenario, all of them by default")
+    parser.add_argument('--corpus', help="recorded corpus to replay instead of the synthetic scenarios")
+    parser.add_argument('--station', help="station code of the recorded corpus")
+    arguments = parser.parse_args()
+
+    logging.disable(logging.WARNING) #Keep the report readable, the stages log at INFO level
+
+    if arguments.corpus != None:
+        assert arguments.station, "--station is needed with --corpus"
+        RunScenario('corpus', arguments.iterations, os.path.join(K_WORKING_DIRECTORY, arguments.corpus), arguments.station)
+        return
+
+    for scenario in arguments.scenario or sorted(fixtures.K_SCENARIOS):
+        RunScenario(scenario, arguments.iterations, None, None)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+'''
+Compare the native template renderer with the Inkscape conversion,
+and the compiled SVG template with the former str.replace substitution.
+The rendered files are written in the working directory.
+Usage, from anywhere: python benchmark/bench_render.py [--iterations 20]
+'''
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+K_REPOSITORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, K_REPOSITORY)
+
+from departure_manager import K_DEPARTURE_PLACEHOLDER
+from svg_template import SvgTemplate
+from template_renderer import K_FALLBACK_FONT, TemplateRenderer
+
+K_TEMPLATE = os.path.join(K_REPOSITORY, 'asset', 'template.svg')
+K_FONT = os.path.join(K_REPOSITORY, K_FALLBACK_FONT)
+
+def CreateInputDict():
+    inputDict = {'HEADER_DEPARTURE': '08:15 | Mon, 03 October',
+                 'HEADER_DESTINATION': 'Wilmslow (WML)'}
+    for index in range(6):
+        inputDict[K_DEPARTURE_PLACEHOLDER.format(index)] = 'Train : Manch. Picca.\n    Plat. : 2    ON TIME\n    Arr.: 8:2{}      Dep.: 8:2{}'.format(index, index)
+    return inputDict
+
+def Measure(_name: str, _function, _iterations: int):
+    _function() #warm-up
+    startTime = time.perf_counter()
+    startCpu = GetCpuTime()
+    for _ in range(_iterations):
+        _function()
+    wallTime = (time.perf_counter() - startTime) / _iterations
+    cpuTime = (GetCpuTime() - startCpu) / _iterations
+    print("{:<14} wall {:8.2f} ms | cpu {:8.2f} ms".format(_name, wallTime * 1000.0, cpuTime * 1000.0))
+
+def UpdateSVGReplace(_templateSvgFilename: str, _outputSvgFilename: str, _inputDict: dict):
+    '''Former utility.UpdateSVG: read the template and replace each key in the whole content'''
+    with open(_templateSvgFilename, 'r', encoding='UTF-8') as svgFile:
+        streamRead = svgFile.read()
+
+    for key in _inputDict:
+        streamRead = streamRead.replace(key, _inputDict[key], 1)
+
+    with open(_outputSvgFilename, 'w', encoding='UTF-8') as svgFile:
+        svgFile.write(streamRead)
+
+def GetCpuTime():
+    '''
+    :return: CPU time of this process and of its terminated child processes (Inkscape)
+    '''
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20)
+    iterations = parser.parse_args().iterations
+    inputDict = CreateInputDict()
+
+    startTime = time.perf_counter()
+    renderer = TemplateRenderer(K_TEMPLATE, K_FONT)
+    print("native template parsing {:.2f} ms".format((time.perf_counter() - startTime) * 1000.0))
+
+    Measure('native', lambda: renderer.Render(inputDict).save('bench_native.png'), iterations)
+
+    svgTemplate = SvgTemplate(K_TEMPLATE)
+    Measure('svg replace', lambda: UpdateSVGReplace(K_TEMPLATE, 'bench_replace.svg', inputDict), iterations * 10)
+    Measure('svg compiled', lambda: svgTemplate.Write('bench_compiled.svg', inputDict), iterations * 10)
+
+    if shutil.which('inkscape') == None:
+        print("inkscape    not found, skipped")
+    else:
+        def RenderInkscape():
+            svgTemplate.Write('bench_inkscape.svg', inputDict)
+            subprocess.run(['inkscape', '--without-gui', '--file=bench_inkscape.svg', '--export-png=bench_inkscape.png'], capture_output=True)
+
+        Measure('inkscape', RenderInkscape, max(1, iterations // 10))
+
+if __name__ == "__main__":
+    main()
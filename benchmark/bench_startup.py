@@ -0,0 +1,132 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+'''
+Startup benchmark: time until the modules are imported, the DepartureManager is ready and the first frame is rendered.
+Each run is a new Python process, the transport API is replayed from a synthetic corpus and the frame is saved instead of displayed.
+The runs are done without the compiled template (first startup) and with it (next startups).
+Usage, from anywhere: python benchmark/bench_startup.py [--runs N] [--scenario wilmslow|piccadilly] [--imports]
+'''
+
+import time
+K_CHILD_START = time.time() #Before any other import, only used by the child process
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+K_REPOSITORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+K_STAGES = ('interpreter', 'imports', 'manager', 'first frame')
+
+
+def RunChild(_stationCode: str, _corpusFilename: str, _directory: str):
+    '''
+    Measure the startup in this process, print the timestamps as JSON.
+    '''
+    sys.path.insert(0, K_REPOSITORY)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(K_REPOSITORY) #Assets are loaded relatively to the repository
+
+    import main #Same imports as the station
+    importTime = time.time()
+
+    import logging
+    import fixtures
+    from departure_manager import DepartureManager
+
+    logging.disable(logging.WARNING)
+
+    config = fixtures.CreateConfig(_stationCode, _corpusFilename, _directory)
+    config['epaper']['enabled'] = False
+
+    manager = DepartureManager(config)
+    manager.SetOutputPrefix(os.path.join(_directory, ''))
+    managerTime = time.time()
+
+    manager.RunDueJobs()
+    frameTime = time.time()
+
+    print(json.dumps({'start': K_CHILD_START, 'imports': importTime, 'manager': managerTime, 'first frame': frameTime}))
+
+def RunProcess(_arguments: list, _traceImports: bool):
+    '''
+    :return: (duration of each stage in seconds, stderr of the process)
+    '''
+    command = [sys.executable] + (['-X', 'importtime'] if _traceImports else []) + [os.path.abspath(__file__)] + _arguments
+
+    launchTime = time.time()
+    process = subprocess.run(command, capture_output=True, text=True, check=True)
+    timestamps = json.loads(process.stdout.strip().splitlines()[-1])
+
+    durations = {'interpreter': timestamps['start'] - launchTime,
+                 'imports': timestamps['imports'] - timestamps['start'],
+                 'manager': timestamps['manager'] - timestamps['imports'],
+                 'first frame': timestamps['first frame'] - timestamps['manager']}
+    return durations, process.stderr
+
+def PrintSlowestImports(_importTrace: str, _count: int = 15):
+    '''
+    Print the modules with the largest cumulative import time, from the output of python -X importtime.
+    '''
+    allImport = []
+    for line in _importTrace.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        allImport.append((int(cumulative), name.strip()))
+
+    print("\nslowest imports")
+    for cumulative, name in sorted(allImport, reverse=True)[:_count]:
+        print("{:<36}{:>9.2f} ms".format(name, cumulative / 1000.0))
+
+def PrintResults(_title: str, _allDurations: list):
+    print("\n{} - {} runs".format(_title, len(_allDurations)))
+    print("{:<22}{:>12}{:>12}".format('stage', 'mean', 'min'))
+    for stage in K_STAGES:
+        values = [durations[stage] * 1000.0 for durations in _allDurations]
+        print("{:<22}{:>9.1f} ms{:>9.1f} ms".format(stage, statistics.mean(values), min(values)))
+
+    totals = [sum(durations.values()) * 1000.0 for durations in _allDurations]
+    print("{:<22}{:>9.1f} ms{:>9.1f} ms".format('total', statistics.mean(totals), min(totals)))
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        RunChild(*sys.argv[2:5])
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--scenario', default='wilmslow')
+    parser.add_argument('--imports', action='store_true', help="list the slowest imports of the station")
+    arguments = parser.parse_args()
+
+    sys.path.insert(0, K_REPOSITORY)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import fixtures
+
+    with tempfile.TemporaryDirectory() as directory:
+        corpusFilename = os.path.join(directory, 'corpus.jsonl.gz')
+        stationCode = fixtures.GenerateCorpus(arguments.scenario, corpusFilename)
+        childArguments = ['--child', stationCode, corpusFilename, directory]
+        compiledFilename = os.path.join(directory, 'template.compiled')
+
+        RunProcess(childArguments, False) #warm-up: .pyc files and places cache, as after a first startup
+
+        withoutArtifact = []
+        withArtifact = []
+        for _ in range(arguments.runs):
+            os.remove(compiledFilename)
+            withoutArtifact.append(RunProcess(childArguments, False)[0])
+            withArtifact.append(RunProcess(childArguments, False)[0])
+
+        PrintResults("{} ({}) without compiled template".format(arguments.scenario, stationCode), withoutArtifact)
+        PrintResults("{} ({}) with compiled template".format(arguments.scenario, stationCode), withArtifact)
+
+        if arguments.imports:
+            PrintSlowestImports(RunProcess(childArguments, True)[1])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+'''
+Synthetic transport API corpora and replay configuration for the benchmarks, in the record/replay format of transport_replay.
+The lines, stations and departures are generated around the real station coordinates,
+a corpus recorded with transportRequest.mode = 'record' can be used instead.
+'''
+
+import math
+import os
+import random
+
+from datetime import timedelta
+
+import utility
+from transport_replay import Corpus, GetRequestKey
+
+K_API_URL = "https://transportapi.com/v3/uk"
+
+#name, station code, station name, (latitude, longitude), lines, departures, stops per line
+K_SCENARIOS = {
+    'wilmslow': ('WML', 'Wilmslow', (53.3268, -2.2265), 2, 8, 10),
+    'piccadilly': ('MAN', 'Manchester Piccadilly', (53.4774, -2.2309), 6, 30, 16),
+}
+
+K_STOP_SPACING_KM = 3.5
+K_STOP_INTERVAL_MIN = 4
+
+def FormatTime(_dateTime):
+    return _dateTime.strftime('%H:%M')
+
+def FormatDate(_dateTime):
+    return _dateTime.strftime('%Y-%m-%d')
+
+def CreateLines(_stationCode: str, _coordinate, _lineCount: int, _stopCount: int, _random: random.Random):
+    '''
+    Create lines radiating from the station, each stop with its own code and coordinate.
+    :return: list of lines, a line being a list of (station code, tiploc code, latitude, longitude) going away from the station
+    '''
+    lines = []
+    for lineIndex in range(_lineCount):
+        bearing = 2.0 * math.pi * lineIndex / _lineCount + _random.uniform(-0.2, 0.2)
+        line = []
+        for stopIndex in range(1, _stopCount + 1):
+            distance = K_STOP_SPACING_KM * stopIndex + _random.uniform(-0.5, 0.5)
+            latitude = _coordinate[0] + math.degrees(distance * math.cos(bearing) / 6371.0)
+            longitude = _coordinate[1] + math.degrees(distance * math.sin(bearing) / (6371.0 * math.cos(math.radians(_coordinate[0]))))
+            code = "{}{}{:02d}".format(_stationCode[0], chr(ord('A') + lineIndex), stopIndex)
+            line.append((code, code + 'TPL', latitude, longitude))
+        lines.append(line)
+    return lines
+
+def CreateStop(_code: str, _tiploc: str, _arrival, _departure):
+    return {'station_code': _code,
+            'tiploc_code': _tiploc,
+            'aimed_arrival_time': FormatTime(_arrival) if _arrival != None else None,
+            'aimed_arrival_date': FormatDate(_arrival) if _arrival != None else None,
+            'aimed_departure_time': FormatTime(_departure) if _departure != None else None,
+            'aimed_departure_date': FormatDate(_departure) if _departure != None else None}
+
+def GenerateCorpus(_scenario: str, _filename: str, _seed: int = 0):
+    '''
+    Write the live, timetable and places responses of a scenario in a corpus file.
+    :param _scenario: key of K_SCENARIOS
+    :param _filename: corpus file to create
+    :return: the station code of the scenario
+    '''
+    stationCode, stationName, coordinate, lineCount, departureCount, stopCount = K_SCENARIOS[_scenario]
+    randomGenerator = random.Random(_seed)
+    corpus = Corpus(_filename)
+
+    lines = CreateLines(stationCode, coordinate, lineCount, stopCount, randomGenerator)
+    now = utility.GetCurrentDateTime().replace(second=0, microsecond=0)
+
+    allDepartureData = []
+    for departureIndex in range(departureCount):
+        serviceID = str(24000000 + departureIndex)
+        origin = lines[departureIndex % lineCount]
+        destination = lines[(departureIndex + 1 + departureIndex // lineCount) % lineCount]
+        departureTime = now + timedelta(minutes=2 + 3 * departureIndex)
+
+        #Stops from the far end of the origin line to the far end of the destination line
+        stops = []
+        for index, (code, tiploc, _, _) in enumerate(reversed(origin)):
+            stopTime = departureTime - timedelta(minutes=K_STOP_INTERVAL_MIN * (len(origin) - index))
+            stops.append(CreateStop(code, tiploc, stopTime - timedelta(minutes=1) if index != 0 else None, stopTime))
+        stops.append(CreateStop(stationCode, stationCode + 'TPL', departureTime - timedelta(minutes=1), departureTime))
+        for index, (code, tiploc, _, _) in enumerate(destination):
+            stopTime = departureTime + timedelta(minutes=K_STOP_INTERVAL_MIN * (index + 1))
+            stops.append(CreateStop(code, tiploc, stopTime, stopTime + timedelta(minutes=1) if index != len(destination) - 1 else None))
+
+        corpus.Append(GetRequestKey("{}/train/service/{}///timetable.json".format(K_API_URL, serviceID), {'station_code': stationCode}),
+                      {'service': serviceID, 'stops': stops})
+
+        allDepartureData.append({'mode': 'train',
+                                 'service': serviceID,
+                                 'train_uid': "{}{:05d}".format(stationCode[0], departureIndex), #Unique across the scenarios, as real train UIDs
+                                 'aimed_departure_time': FormatTime(departureTime),
+                                 'expected_departure_time': FormatTime(departureTime + timedelta(minutes=randomGenerator.choice((0, 0, 0, 2, 5)))),
+                                 'platform': str(1 + departureIndex % 4),
+                                 'destination_name': "{} {}".format(stationName, destination[-1][0]),
+                                 'status': randomGenerator.choice(('ON TIME', 'ON TIME', 'LATE', 'EARLY'))})
+
+    corpus.Append(GetRequestKey("{}/train/station/{}/live.json".format(K_API_URL, stationCode), {'calling_at': '', 'darwin': 'true'}),
+                  {'station_name': stationName, 'departures': {'all': allDepartureData}})
+
+    allPlaces = [(stationCode, stationCode + 'TPL', coordinate[0], coordinate[1])]
+    for line in lines:
+        allPlaces.extend(line)
+
+    for code, tiploc, latitude, longitude in allPlaces:
+        corpus.Append(GetRequestKey("{}/places.json".format(K_API_URL), {'query': "{},{}".format(code, tiploc), 'type': 'train_station'}),
+                      {'member': [{'type': 'train_station', 'station_code': code, 'latitude': latitude, 'longitude': longitude}]})
+
+    corpus.Close()
+    return stationCode
+
+def CreateConfig(_stationCode: str, _corpusFilename: str, _directory: str):
+    '''
+    :return: config.json with the transport API replayed and the persistent files in _directory
+    '''
+    config = utility.LoadConfig()
+
+    config['debugDumpImages'] = False
+    config['transportRequest'].update({'station_code': _stationCode,
+                                       'mode': 'replay',
+                                       'corpusFilename': _corpusFilename,
+                                       'replayLatency': 0.0,
+                                       'replayClock': True})
+    config['placesCache']['filename'] = os.path.join(_directory, 'places_cache.db')
+    config['quota']['ledgerFilename'] = os.path.join(_directory, 'quota_ledger.json')
+    config['quota']['adaptive'] = False
+    config['render']['compiledTemplate'] = os.path.join(_directory, 'template.compiled')
+    return config
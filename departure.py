@@ -1,16 +1,78 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
 
+import bisect
 import datetime
+import sys
 
-from utility import AbbreviateMessage, GetCurrentDateTime
+from abbreviation import Abbreviator
+from utility import Clamp, GetCurrentDateTime
 
-K_DEFAULT_DATECODE = '%Y-%m-%d'
-K_DEFAULT_TIMECODE = '%H:%M'
+K_STOP_KEYS = {'departure': ('aimed_departure_time', 'aimed_departure_date'),
+               'arrival': ('aimed_arrival_time', 'aimed_arrival_date')}
+K_EXPECTED_STOP_KEYS = {'departure': ('expected_departure_time', 'expected_departure_date'),
+                        'arrival': ('expected_arrival_time', 'expected_arrival_date')}
+
+K_HALF_DAY = datetime.timedelta(hours=12)
+K_ONE_DAY = datetime.timedelta(days=1)
+K_NO_DELAY = datetime.timedelta(0)
+
+K_DEFAULT_DATE = (1900, 1, 1) #Date of a time without date, as datetime.strptime
+K_MEMO_SIZE = 2048
+
+#The timetables of a refresh only contain a few dates and at most 1440 times
+DateMemo = {} #'YYYY-MM-DD' -> (year, month, day)
+TimeMemo = {} #'HH:MM' -> (hour, minute)
 
 def CheckValue(_value: str, _exception):
     return _value if _value != None else _exception
 
+def GetDepartureKey(_departureData: dict):
+    '''
+    The service ID is shared by the trains of a route, the train UID or the aimed time tells them apart.
+    :param _departureData: A raw live departure data dictionary.
+    :return: (service ID, train ID) identifying a train of the live data
+    '''
+    return str(_departureData['service']), CheckValue(_departureData.get('train_uid'), _departureData.get('aimed_departure_time'))
+
+def ParseDate(_date: str):
+    '''
+    :param _date: 'YYYY-MM-DD' date, or ' ' for no date.
+    :return: (year, month, day). Raise a ValueError if the date is not valid
+    '''
+    result = DateMemo.get(_date)
+    if result == None:
+        if _date == ' ':
+            result = K_DEFAULT_DATE
+        else:
+            year, month, day = _date.split('-')
+            result = (int(year), int(month), int(day))
+            datetime.date(*result) #Validate the day of the month
+
+        if len(DateMemo) >= K_MEMO_SIZE:
+            DateMemo.clear()
+        DateMemo[_date] = result
+    return result
+
+def ParseTime(_time: str):
+    '''
+    :param _time: 'HH:MM' time, or ' ' for midnight.
+    :return: (hour, minute). Raise a ValueError if the time is not valid
+    '''
+    result = TimeMemo.get(_time)
+    if result == None:
+        if _time == ' ':
+            result = (0, 0)
+        else:
+            hour, minute = _time.split(':')
+            result = (int(hour), int(minute))
+            datetime.time(*result) #Validate the range
+
+        if len(TimeMemo) >= K_MEMO_SIZE:
+            TimeMemo.clear()
+        TimeMemo[_time] = result
+    return result
+
 def ParseStopDatetime(_stopData: dict, _type: str):
     '''
     Get the time and date data to create a Datetime class.
@@ -18,45 +80,127 @@ def ParseStopDatetime(_stopData: dict, _type: str):
     :param _type: The attribute name of the aimed time ('departure' or 'arrival'). Raise a Error if the type is not valid.
     :return: a parsed Datetime class or None if _stopData doesn't contains a time value
     '''
-    assert _type == 'arrival' or _type == 'departure', "_type value is incorrect, should correspond to 'arrival' or 'departures' only"
-    aimedStopTime = CheckValue(_stopData['aimed_'+ _type +'_time'], None)
-    aimedStopDate = CheckValue(_stopData['aimed_'+ _type +'_date'], None)
+    assert _type in K_STOP_KEYS, "_type value is incorrect, should correspond to 'arrival' or 'departures' only"
+    timeKey, dateKey = K_STOP_KEYS[_type]
+
+    aimedStopTime = _stopData[timeKey]
+    if aimedStopTime == None:
+        return None
+
+    year, month, day = ParseDate(_stopData[dateKey])
+    hour, minute = ParseTime(aimedStopTime)
+    return datetime.datetime(year, month, day, hour, minute)
+
+def ParseExpectedDatetime(_stopData: dict, _type: str, _aimedDatetime: datetime.datetime):
+    '''
+    Get the realtime date and time of a stop, when the API provides it.
+    :param _stopData: A raw stop data dictionary.
+    :param _type: 'departure' or 'arrival'.
+    :param _aimedDatetime: aimed Datetime of the same stop.
+    :return: the expected Datetime, or _aimedDatetime if there is no expected time
+    '''
+    timeKey, dateKey = K_EXPECTED_STOP_KEYS[_type]
+    expectedTime = _stopData.get(timeKey)
+    if expectedTime == None or _aimedDatetime == None:
+        return _aimedDatetime
 
-    result = None
-    if aimedStopTime != None:
-        aimedStopDatetime = '{} {}'.format(aimedStopDate, aimedStopTime)
-        aimedStopFormat = '{} {}'.format((K_DEFAULT_DATECODE if aimedStopDate != ' ' else ''), (K_DEFAULT_TIMECODE if aimedStopTime != ' ' else ''))
+    hour, minute = ParseTime(expectedTime)
+    expectedDate = _stopData.get(dateKey)
+    if expectedDate != None:
+        year, month, day = ParseDate(expectedDate)
+        return datetime.datetime(year, month, day, hour, minute)
 
-        result = datetime.datetime.strptime(aimedStopDatetime, aimedStopFormat)
+    #Without date, the expected time is the closest one to the aimed time, a delay can cross midnight
+    result = _aimedDatetime.replace(hour=hour, minute=minute)
+    if result < _aimedDatetime - K_HALF_DAY:
+        result += K_ONE_DAY
+    elif result > _aimedDatetime + K_HALF_DAY:
+        result -= K_ONE_DAY
     return result
 
+def ParseLiveDelay(_departureData: dict):
+    '''
+    Get the delay of a live departure at the station.
+    :param _departureData: A raw live departure data dictionary.
+    :return: expected minus aimed departure time as a timedelta, None if the live data has no expected time
+    '''
+    aimedTime = _departureData.get('aimed_departure_time')
+    expectedTime = _departureData.get('expected_departure_time')
+    if aimedTime == None or expectedTime == None:
+        return None
+
+    aimedHour, aimedMinute = ParseTime(aimedTime)
+    expectedHour, expectedMinute = ParseTime(expectedTime)
+    delayMinutes = (expectedHour - aimedHour) * 60 + (expectedMinute - aimedMinute)
+
+    #The closest delay, a late train can leave after midnight
+    delayMinutes = (delayMinutes + 12 * 60) % (24 * 60) - 12 * 60
+    return datetime.timedelta(minutes=delayMinutes)
+
 
 class Stop:
     ''' Simplified timetable stop'''
+    __slots__ = ('m_StationCode', 'm_TiplocCode', 'm_AimedDepartureDatetime', 'm_AimedArrivalDatetime',
+                 'm_ExpectedDepartureDatetime', 'm_ExpectedArrivalDatetime')
+
     def __init__(self, _timetable: dict):
-        self.m_StationCode = _timetable['station_code']
-        self.m_TiplocCode = _timetable['tiploc_code']
+        #The same codes are found in many timetables, keep a single string of each
+        self.m_StationCode = sys.intern(_timetable['station_code'])
+        tiplocCode = _timetable['tiploc_code']
+        self.m_TiplocCode = sys.intern(tiplocCode) if tiplocCode != None else None
 
         self.m_AimedDepartureDatetime = ParseStopDatetime(_timetable, 'departure')
         self.m_AimedArrivalDatetime = ParseStopDatetime(_timetable, 'arrival')
 
+        #Realtime times, equal to the aimed ones when the API doesn't provide them
+        self.m_ExpectedDepartureDatetime = ParseExpectedDatetime(_timetable, 'departure', self.m_AimedDepartureDatetime)
+        self.m_ExpectedArrivalDatetime = ParseExpectedDatetime(_timetable, 'arrival', self.m_AimedArrivalDatetime)
+
 
 class Departure:
     '''Class for keeping track of a departure'''
+    __slots__ = ('m_Mode', 'm_ServiceID', 'm_Platform', 'm_AimedDepartureDatetime', 'm_AimedArrivalDatetime',
+                 'm_DestinationName', 'm_Status', 'm_Timetable', 'm_TimetableAfterArrival', 'm_TimeIndex', 'm_TrainID', 'm_TrainUID',
+                 'm_LiveDelay', 'm_TimetableDelay')
 
-    def __init__(self, _departureData: dict, _abbreviationDict: dict):
+    def __init__(self, _departureData: dict, _abbreviator: Abbreviator):
         self.m_Mode = _departureData['mode'].title()
-        self.m_ServiceID = str(_departureData['service'])
+        self.m_ServiceID, self.m_TrainID = GetDepartureKey(_departureData)
+        self.m_TrainUID = _departureData.get('train_uid') #None when the API doesn't provide it
         self.m_Platform = CheckValue(_departureData['platform'], '-')
 
         self.m_AimedDepartureDatetime = None
         self.m_AimedArrivalDatetime = None
 
-        self.m_DestinationName = AbbreviateMessage(_abbreviationDict, CheckValue(_departureData['destination_name'], '----'))
+        self.m_DestinationName = _abbreviator.Abbreviate(CheckValue(_departureData['destination_name'], '----'), self.m_Mode + ' : ')
         self.m_Status = _departureData['status']
 
         self.m_Timetable = []
         self.m_TimetableAfterArrival = []
+        self.m_TimeIndex = [] #Expected time the train leaves each stop of m_Timetable, shifted by the live delay, sorted
+
+        self.m_LiveDelay = ParseLiveDelay(_departureData) #Delay at the station of the last live request
+        self.m_TimetableDelay = K_NO_DELAY                #Delay at the station when the timetable was requested
+
+    def UpdateLiveData(self, _departureData: dict):
+        '''
+        Update in place the live information of the departure, the timetable is kept.
+        :param _departureData: A raw live departure data dictionary of the same train.
+        :return: None
+        '''
+        self.m_Platform = CheckValue(_departureData['platform'], '-')
+        self.m_Status = _departureData['status']
+
+        liveDelay = ParseLiveDelay(_departureData)
+        if liveDelay != self.m_LiveDelay:
+            self.m_LiveDelay = liveDelay
+            self.BuildTimeIndex()
+
+    def HasTimetable(self):
+        '''
+        :return: True if the timetable has already been filled
+        '''
+        return len(self.m_Timetable) != 0
 
     def CanDelete(self):
         '''
@@ -96,8 +240,59 @@ class Departure:
 
         self.m_TimetableAfterArrival.reverse()
 
-        self.m_AimedArrivalDatetime = self.m_Timetable[-1].m_AimedArrivalDatetime
-        self.m_AimedDepartureDatetime = self.m_Timetable[-1].m_AimedDepartureDatetime
+        stationStop = self.m_Timetable[-1]
+        self.m_TimetableDelay = K_NO_DELAY
+        if stationStop.m_ExpectedDepartureDatetime != None:
+            self.m_TimetableDelay = stationStop.m_ExpectedDepartureDatetime - stationStop.m_AimedDepartureDatetime
+
+        self.BuildTimeIndex()
+
+        self.m_AimedArrivalDatetime = stationStop.m_AimedArrivalDatetime
+        self.m_AimedDepartureDatetime = stationStop.m_AimedDepartureDatetime
+
+    def GetLiveShift(self):
+        '''
+        :return: change of the delay at the station since the timetable was requested, added to the expected times of the stops
+        '''
+        if self.m_LiveDelay == None:
+            return K_NO_DELAY
+        return self.m_LiveDelay - self.m_TimetableDelay
+
+    def BuildTimeIndex(self):
+        '''
+        Index the time the train leaves each stop, with the last live delay.
+        :return: None
+        '''
+        shift = self.GetLiveShift()
+
+        self.m_TimeIndex = []
+        previousTime = datetime.datetime.min
+        for stop in self.m_Timetable:
+            leaveTime = CheckValue(stop.m_ExpectedDepartureDatetime, stop.m_ExpectedArrivalDatetime)
+            if leaveTime != None:
+                previousTime = max(previousTime, leaveTime + shift) #Keep the index sorted for bisect
+            self.m_TimeIndex.append(previousTime)
+
+    def GetPosition(self, _currentDateTime: datetime.datetime):
+        '''
+        Locate the train between two stops, with the expected times and the last live delay.
+        :param _currentDateTime: current date and time.
+        :return: (previous Stop, next Stop, ratio of the way done between them), or None if the train has not left the first stop or has passed the station
+        '''
+        index = bisect.bisect_right(self.m_TimeIndex, _currentDateTime)
+        if index == 0 or index >= len(self.m_Timetable):
+            return None
+
+        previousStop = self.m_Timetable[index - 1]
+        nextStop = self.m_Timetable[index]
+        if nextStop.m_ExpectedArrivalDatetime == None:
+            return None
+
+        leaveTime = self.m_TimeIndex[index - 1]
+        totalTime = (nextStop.m_ExpectedArrivalDatetime + self.GetLiveShift() - leaveTime).total_seconds()
+        timeRatio = (_currentDateTime - leaveTime).total_seconds() / totalTime if totalTime > 0 else 1.0
+
+        return previousStop, nextStop, Clamp(timeRatio, 0.0, 1.0)
 
     def GetDepartureInformation(self):
         '''
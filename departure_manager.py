@@ -1,223 +1,398 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
 
-import json
 import logging
-import math
 import time
 
 from datetime import timedelta
 from PIL import Image, ImageDraw, ImageFont
 
+import geo
+import tracing
 import utility
-from departure import Departure
+from abbreviation import Abbreviator, GlyphMetrics
+from departure import Departure, GetDepartureKey
+from scheduler import Scheduler
+from shared_services import SharedServices
+from station_graph import NodeStation
+from svg_template import SvgTemplate
+from template_renderer import TemplateRenderer
 from transportrequest import TransportRequest
 
+#Jobs of the scheduler, run in this order when several are due
+K_JOB_AGENDA = 'agenda'
+K_JOB_LIVE = 'live'
+K_JOB_TIMETABLE = 'timetable'
+K_JOB_EXPIRE = 'expire'
+K_JOB_DISPLAY = 'display'
 
-class NodeStation:
-    def __init__(self, _ID: str, _pixelPosition = (0,0)):
-        self.m_ID = _ID
-        self.m_PixelPosition = _pixelPosition
+K_STATION_MAP_SIZE = (400, 480)
+K_STATION_MAP_MARGIN = 1.414 #Stations are added up to distanceDrawMap * margin, to draw the lines leaving the map
 
-        self.m_ChildNodeStation = []
+#Placeholder of the departures in the template: DEPARTURE_00, DEPARTURE_01, ...
+K_DEPARTURE_PLACEHOLDER = 'DEPARTURE_{:02d}'
 
-    def AddNode(self, _node):
-        self.m_ChildNodeStation.append(_node)
-
-    def Search(self, _ID: str):
+class DepartureManager:
+    '''Handle the request, the display and the validity of the departures'''
+    def __init__(self, _config: dict = None, _services: SharedServices = None):
         '''
-        Recursively search the corresponding stastion code
-        :param _ID: station code ID to search
-        :return: the corresponding NodeStation if found or None
+        :param _config: configuration dictionary, 'config.json' is loaded if None.
+        :param _services: services shared with the other stations of the process, created for this station if None.
         '''
-        if self.m_ID == _ID:
-            return self
+        self.config = _config if _config != None else self.LoadConfig()
+        self.maxDeparture = self.config['maxDepartures']
 
-        result = None
-        for childNodeStation in self.m_ChildNodeStation:
-            result = childNodeStation.Search(_ID)
+        self.b_OwnsServices = _services == None #Closed by the owner of the shared services otherwise
+        self.m_Services = _services if _services != None else SharedServices(self.config)
+        self.distanceDrawMap = self.config['distanceDrawMap']
 
-            if result != None:
-                return result
+        self.m_Scheduler = Scheduler()
+        self.m_Scheduler.Schedule(K_JOB_AGENDA, 0)
+        self.m_RefreshDisplay = 0
+        self.m_RefreshDepartures = 0
 
-        return None
+        self.m_EPaperSession = None #Without e-Paper, the frames are only saved in m_FrameFilename
+        if self.config['epaper']['enabled']:
+            configEPaper = self.config['epaper']
+            self.m_EPaperSession = utility.EPaperSession(configEPaper['deepSleepThreshold'], configEPaper['backend'],
+                                                         configEPaper['simulatedFrameFilename'], configEPaper['spiSpeedHz'])
 
+        self.m_QuotaLedger = self.m_Services.m_QuotaLedger
+        self.m_QuotaPlanner = self.m_Services.m_QuotaPlanner
 
-class DepartureManager:
-    '''Handle the request, the display and the validity of the departures'''
-    def __init__(self):
-        self.config = self.LoadConfig()
-        self.maxDeparture = self.config['maxDepartures']
-        self.distanceDrawMap = self.config['distanceDrawMap']
+        self.transportRequest = TransportRequest(self.config['transportRequest'], self.m_QuotaLedger, self.m_Services.m_Session)
 
-        self.m_AgendaTimer = utility.Timer()
-        self.m_DepartureRequestTimer = utility.Timer()
-        self.m_RefreshDisplayTimer = utility.Timer()
-        self.b_CanRefresh = False
+        self.m_PlacesCache = self.m_Services.m_PlacesCache
+        self.m_TimetableCache = self.m_Services.m_TimetableCache
+        self.m_FrameCache = self.m_Services.m_FrameCache
 
-        self.transportRequest = TransportRequest(self.config['transportRequest'])
         self.stationName = str("")
         self.allDepartures = []
+        self.m_LiveDepartures = [] #All the departures of the last live request, displayed or not
 
-        self.m_Tree = None
+        self.m_StationGraph = self.m_Services.m_StationGraph
+        self.m_RootNode = None #Node of this station in the station graph
         self.m_CenterCoordinate = (0,0)
-
-        self.m_DepartureFilename = "departures.png"
-        self.m_StationMapFilename = "station_map.jpg"
+        self.m_MapProjection = None #Projection of the station map, centered on this station
+        self.m_NodePixelPositions = {} #Node ID -> pixel position, projected with the map of m_StationMapRevision
+        self.m_StationMapRevision = None #Revision of the station graph drawn, the map is redrawn only when the graph has changed
+        self.m_MapFont = None
+
+        self.m_TemplateFilename = 'asset/template.svg'
+        self.m_TemplateRenderer = None
+        self.m_SvgTemplate = None
+        if self.config['render']['engine'] == 'native':
+            self.m_TemplateRenderer = TemplateRenderer(self.m_TemplateFilename, self.config['render']['font'], self.config['render']['compiledTemplate'])
+            allPlaceholder = set(self.m_TemplateRenderer.m_Fields)
+        else:
+            self.m_SvgTemplate = SvgTemplate(self.m_TemplateFilename)
+            allPlaceholder = self.m_SvgTemplate.GetPlaceholders()
+
+        allDeparturePlaceholder = [K_DEPARTURE_PLACEHOLDER.format(index) for index in range(self.maxDeparture)]
+        missingPlaceholders = [placeholder for placeholder in allDeparturePlaceholder if placeholder not in allPlaceholder]
+        if len(missingPlaceholders) != 0:
+            logging.warning("maxDepartures is {} but {} has no {}".format(self.maxDeparture, self.m_TemplateFilename, ', '.join(missingPlaceholders)))
+
+        self.m_Abbreviator = Abbreviator(self.config['abbreviation'], self.config['aggressiveAbbreviation'])
+        if self.m_TemplateRenderer != None:
+            #The destinations are fitted in the narrowest departure box, measured with the font they are drawn with
+            allField = [self.m_TemplateRenderer.m_Fields[placeholder] for placeholder in allDeparturePlaceholder if placeholder in allPlaceholder]
+            if len(allField) != 0:
+                field = min(allField, key=lambda field: self.m_TemplateRenderer.GetFieldWidth(field.m_Placeholder))
+                self.m_Abbreviator.SetFitting(GlyphMetrics(self.m_TemplateRenderer.GetFont(field.m_FontSize)),
+                                              self.m_TemplateRenderer.GetFieldWidth(field.m_Placeholder))
+
+        #Images passed between the drawing stages, dumped on disk only with debugDumpImages
+        self.m_DepartureImage = None
+        self.m_StationMapImage = None
+        self.m_TrainPositionImage = None
+        self.b_DebugDumpImages = self.config['debugDumpImages']
+
+        self.SetOutputPrefix('')
+
+    def SetOutputPrefix(self, _prefix: str):
+        '''
+        Prefix the output files, to keep the files of several stations apart.
+        :return: None
+        '''
+        self.m_DepartureFilename = _prefix + "departures.png"
+        self.m_DepartureSvgFilename = _prefix + "departures.svg"
+        self.m_StationMapFilename = _prefix + "station_map.png"
+        self.m_FrameFilename = _prefix + "frame.png"
 
     def Update(self):
-        self.AgendaUpdate()
+        with tracing.Cycle():
+            self.RunDueJobs()
+        self.m_Services.Flush()
+
+        self.SleepBehavior()
+
+    def RunDueJobs(self):
+        '''
+        Run, in the pipeline order, only the stages whose job is due, and display the new frame.
+        :return: None
+        '''
+        frameImage = self.RunDueStages()
+        if frameImage != None:
+            self.DisplayFrame(frameImage, self.GetNextUpdateDelay())
+
+    def RunDueStages(self):
+        '''
+        Run, in the pipeline order, only the request and drawing stages whose job is due, without the e-Paper refresh.
+        A stage schedules the following ones immediately when its result changes what is displayed.
+        :return: the new frame Image, None if no frame was drawn
+        '''
+        if self.m_Scheduler.PopIfDue(K_JOB_AGENDA):
+            with tracing.Span('AgendaUpdate'):
+                self.AgendaUpdate()
 
         #Requests
-        self.DepartureRequests()
-        self.UpdateDepartures()
-        self.FillNodeStation()
+        if self.m_Scheduler.PopIfDue(K_JOB_LIVE):
+            with tracing.Span('DepartureRequests'):
+                self.DepartureRequests()
+
+        if self.m_Scheduler.PopIfDue(K_JOB_TIMETABLE):
+            with tracing.Span('UpdateDepartures'):
+                self.UpdateDepartures()
+            with tracing.Span('FillNodeStation'):
+                self.FillNodeStation()
+
+        if self.m_Scheduler.PopIfDue(K_JOB_EXPIRE):
+            with tracing.Span('ExpireDepartures'):
+                self.ExpireDepartures()
 
         #Drawing
-        self.CreateDepartureImage()
-        self.DrawStationMap()
-        self.DrawTrainPosition()
+        if self.m_Scheduler.PopIfDue(K_JOB_DISPLAY):
+            return self.RenderFrame()
+        return None
+
+    def RenderFrame(self):
+        '''
+        Draw a new frame, schedule the next one and publish it to the frame server.
+        :return: the frame Image
+        '''
+        with tracing.Span('CreateDepartureImage'):
+            self.CreateDepartureImage()
+        with tracing.Span('DrawStationMap'):
+            self.DrawStationMap()
+        with tracing.Span('DrawTrainPosition'):
+            self.DrawTrainPosition()
 
-        utility.MergeImages(self.m_DepartureFilename, self.m_StationMapFilename, self.m_DepartureFilename, box= (250, 0))
+        with tracing.Span('MergeImages'):
+            frameImage = self.CreateFrameImage()
 
-        utility.DisplayOnEPaper(self.m_DepartureFilename)
+        self.m_Scheduler.Schedule(K_JOB_DISPLAY, self.m_RefreshDisplay)
+        if self.m_FrameCache != None:
+            self.m_FrameCache.Add(self.transportRequest.m_StationCode, utility.GetCurrentDateTime(), frameImage)
+        elif self.m_EPaperSession == None:
+            frameImage.save(self.m_FrameFilename)
 
-        self.SleepBehavior()
+        return frameImage
+
+    def DisplayFrame(self, _frameImage: Image.Image, _nextRefreshDelay: float):
+        '''
+        Display a frame on the e-ink screen, only touches the e-Paper session.
+        :param _frameImage: frame Image drawn by RenderFrame.
+        :param _nextRefreshDelay: time in seconds until the next refresh, choose between light and deep sleep.
+        :return: None
+        '''
+        if self.m_EPaperSession == None:
+            return
+
+        with tracing.Span('DisplayOnEPaper'):
+            self.m_EPaperSession.Display(_frameImage, _nextRefreshDelay)
+
+    def GetStations(self):
+        '''
+        :return: list of the DepartureManager of the process, this one
+        '''
+        return [self]
+
+    def Close(self):
+        '''
+        Release the resources kept between the updates.
+        :return: None
+        '''
+        if self.b_OwnsServices:
+            self.m_Services.Close()
+        if self.m_EPaperSession != None:
+            self.m_EPaperSession.Close()
 
     def AgendaUpdate(self):
         '''
-        Update and restart the different timers based on Agenda in config.json.
-        Set b_CanRefresh to True
+        Update the refresh intervals based on Agenda in config.json, schedule the next agenda update
+        and request the departures immediately.
         :return: None
         '''
-        if self.m_AgendaTimer.IsElapsed():
-            logging.info("Agenda Update")
-            agenda = self.config['agenda']
+        logging.info("Agenda Update")
+        agenda = self.config['agenda']
 
-            currentDateTime = utility.GetCurrentDateTime()
-            conditionDateTime = currentDateTime
-            currentAgendaUpdate = agenda[-1]
-            nextAgendaRefresh = None
-            for timeCondition in agenda:
-                hour, minute = [int(value) for value in timeCondition['startCondition'].split(':')]
-                conditionDateTime = currentDateTime.replace(hour=hour, minute=minute)
-                if conditionDateTime > currentDateTime:
-                    nextAgendaRefresh = conditionDateTime
-                    break
+        currentDateTime = utility.GetCurrentDateTime()
+        conditionDateTime = currentDateTime
+        currentAgendaUpdate = agenda[-1]
+        nextAgendaRefresh = None
+        for timeCondition in agenda:
+            hour, minute = [int(value) for value in timeCondition['startCondition'].split(':')]
+            conditionDateTime = currentDateTime.replace(hour=hour, minute=minute)
+            if conditionDateTime > currentDateTime:
+                nextAgendaRefresh = conditionDateTime
+                break
 
-                currentAgendaUpdate = timeCondition
+            currentAgendaUpdate = timeCondition
 
-            assert currentAgendaUpdate, "At this point, the time condition should not be equals to None. Check config.json, agenda part"
+        assert currentAgendaUpdate, "At this point, the time condition should not be equals to None. Check config.json, agenda part"
 
-            if nextAgendaRefresh == None:
-                nextAgendaRefresh = currentDateTime
+        if nextAgendaRefresh == None:
+            nextAgendaRefresh = currentDateTime
 
-                hour, minute = [int(value) for value in agenda[0]['startCondition'].split(':')]
-                nextAgendaRefresh = currentDateTime.replace(hour=hour, minute=minute)
-                nextAgendaRefresh = nextAgendaRefresh + timedelta(days=1)
+            hour, minute = [int(value) for value in agenda[0]['startCondition'].split(':')]
+            nextAgendaRefresh = currentDateTime.replace(hour=hour, minute=minute)
+            nextAgendaRefresh = nextAgendaRefresh + timedelta(days=1)
 
-            #calculate duration next refresh
-            calculatedDuration = (nextAgendaRefresh - currentDateTime).total_seconds()
+        #calculate duration next refresh
+        calculatedDuration = (nextAgendaRefresh - currentDateTime).total_seconds()
 
-            self.m_AgendaTimer.Reset()
-            self.m_AgendaTimer.m_Duration = calculatedDuration
+        self.m_Scheduler.Schedule(K_JOB_AGENDA, calculatedDuration)
 
 
-            refreshDisplay = currentAgendaUpdate['refreshDisplay']
-            refreshDepartures = currentAgendaUpdate['refreshDepartures']
+        refreshDisplay = currentAgendaUpdate['refreshDisplay']
+        refreshDepartures = currentAgendaUpdate['refreshDepartures']
 
-            self.m_DepartureRequestTimer.m_Duration = refreshDepartures
-            self.m_DepartureRequestTimer.Reset()
-            self.m_RefreshDisplayTimer.m_Duration = refreshDisplay
-            self.m_RefreshDisplayTimer.Reset()
-            self.b_CanRefresh = True
+        self.m_RefreshDepartures = refreshDepartures
+        self.m_RefreshDisplay = refreshDisplay
+        self.m_Scheduler.Schedule(K_JOB_LIVE, 0)
+        self.m_Scheduler.Schedule(K_JOB_DISPLAY, 0)
 
-            logging.debug("Next agenda update {} | Timer Departure : {} | Refresh Display {}".format(calculatedDuration, refreshDepartures, refreshDisplay))
+        logging.debug("Next agenda update {} | Timer Departure : {} | Refresh Display {}".format(calculatedDuration, refreshDepartures, refreshDisplay))
 
     def DepartureRequests(self):
         '''
-        Pulls the departures data from the transport API.
-        Checks if the condition to refresh the departures is valid before ask.
+        Pulls the departures data from the transport API and schedule the next request.
+        The departures already known are reconciled by service and train ID and keep their timetable.
         :return: None
         '''
-        if self.m_DepartureRequestTimer.IsElapsed() or self.b_CanRefresh:
-            logging.info("Departure Requests")
+        logging.info("Departure Requests")
 
-            del self.allDepartures[:]
+        allDeparturesData, self.stationName = self.transportRequest.GetLiveServices()
 
-            allDeparturesData, self.stationName = self.transportRequest.GetLiveServices()
+        knownDepartures = {}
+        for departure in self.m_LiveDepartures:
+            knownDepartures.setdefault((departure.m_ServiceID, departure.m_TrainID), []).append(departure)
 
-            for departureData in allDeparturesData:
-                departure = Departure(departureData, self.config['abbreviation'])
-                self.allDepartures.append(departure)
+        del self.m_LiveDepartures[:]
+        for departureData in allDeparturesData:
+            sameTrainDepartures = knownDepartures.get(GetDepartureKey(departureData))
+
+            if sameTrainDepartures:
+                departure = sameTrainDepartures.pop(0)
+                departure.UpdateLiveData(departureData)
+            else:
+                departure = Departure(departureData, self.m_Abbreviator)
 
-            self.m_DepartureRequestTimer.Reset()
-            self.b_CanRefresh = True
+            self.m_LiveDepartures.append(departure)
+
+        self.m_Scheduler.Schedule(K_JOB_LIVE, self.GetRefreshDepartures())
+        self.m_Scheduler.Schedule(K_JOB_TIMETABLE, 0)
+
+    def GetRefreshDepartures(self):
+        '''
+        Interval until the next live request, adapted to the remaining API quota if the planner is enabled.
+        :return: time in seconds
+        '''
+        if self.m_QuotaPlanner == None:
+            return self.m_RefreshDepartures
+
+        return self.m_QuotaPlanner.GetRefreshDepartures(self.m_RefreshDepartures, utility.GetCurrentDateTime())
 
     def UpdateDepartures(self):
         '''
-        Check if the departures are still valid to be displayed
+        Request the timetables of the new departures and select the departures to display.
         :return: None
         '''
         logging.info("Updates Departure")
 
-        if self.b_CanRefresh:
-            for departure in self.allDepartures:
-                timetable = self.transportRequest.GetTimetabledAtServiceID(departure.m_ServiceID)
-                departure.FillTimetable(timetable, self.transportRequest.m_StationCode)
+        newDepartures = [departure for departure in self.m_LiveDepartures if not departure.HasTimetable()]
+        logging.debug("Timetable requests for {} of {} departures".format(len(newDepartures), len(self.m_LiveDepartures)))
 
-        index = len(self.allDepartures) - 1
-        while index >= 0:
-            if(self.allDepartures[index].CanDelete()):
-                self.allDepartures.pop(index)
+        #A train already requested, or being requested, comes from the timetable cache
+        self.m_TimetableCache.Purge()
+        keys = [self.GetTimetableKey(departure) for departure in newDepartures]
+        allTimetables = self.m_TimetableCache.GetTimetables(keys, lambda _keys: self.transportRequest.GetTimetablesAtServiceIDs([key[0] for key in _keys]))
 
-            index -= 1
+        for departure, timetable in zip(newDepartures, allTimetables):
+            departure.FillTimetable(timetable, self.transportRequest.m_StationCode)
 
-        del self.allDepartures[self.maxDeparture:] #truncate list
+        self.ExpireDepartures()
 
-    def CreateDepartureImage(self):
+    def GetTimetableKey(self, _departure: Departure):
+        '''
+        The train UID identifies the same train at all the configured stations, so its timetable is shared by them.
+        Without train UID, the train is only known by its aimed time at this station.
+        :return: key of the timetable of a departure in the timetable cache
         '''
-        Convert the departure data into an image.
-        The type of image is defined by m_DepartureFilename.
+        if _departure.m_TrainUID != None:
+            return (_departure.m_ServiceID, _departure.m_TrainUID)
+        return (_departure.m_ServiceID, self.transportRequest.m_StationCode, _departure.m_TrainID)
+
+    def ExpireDepartures(self):
+        '''
+        Select the departures still valid to be displayed, and schedule the next expiration.
+        The expired departures are replaced by the next ones of the last live request.
         :return: None
         '''
+        self.allDepartures = [departure for departure in self.m_LiveDepartures if not departure.CanDelete()]
+        del self.allDepartures[self.maxDeparture:] #truncate list
 
-        if self.m_RefreshDisplayTimer.IsElapsed() or self.b_CanRefresh:
-            logging.info("Create Departure PNG")
+        self.m_Scheduler.Schedule(K_JOB_DISPLAY, 0)
 
-            departureDict = self.InitDeparturesDictionaries()
+        currentDateTime = utility.GetCurrentDateTime()
+        allDepartureDatetime = [departure.m_AimedDepartureDatetime for departure in self.allDepartures]
+        if len(allDepartureDatetime) != 0:
+            nextExpiration = (min(allDepartureDatetime) - currentDateTime).total_seconds() + 1.0 #CanDelete is True once strictly passed
+            self.m_Scheduler.Schedule(K_JOB_EXPIRE, nextExpiration)
+        else:
+            self.m_Scheduler.Cancel(K_JOB_EXPIRE)
 
-            if(len(self.allDepartures) == 0):
-                departureDict['DEPARTURE_02'] = "No departures for the moment." #Display in the 'middle' of the screen
+    def CreateDepartureImage(self):
+        '''
+        Convert the departure data into an image, kept in m_DepartureImage.
+        :return: None
+        '''
 
-            else:
-                index = 0
-                for departure in self.allDepartures:
+        logging.info("Create Departure PNG")
 
-                    departureID = "DEPARTURE_0" + str(index)
-                    departureMessage = departure.GetDepartureInformation()
+        departureDict = self.InitDeparturesDictionaries()
 
-                    departureDict[departureID] = departureMessage
-                    index += 1
+        if(len(self.allDepartures) == 0):
+            departureDict[K_DEPARTURE_PLACEHOLDER.format(2)] = "No departures for the moment." #Display in the 'middle' of the screen
 
-            utility.UpdateSVG('asset/template.svg', 'departures.svg', departureDict)
-            utility.ConvertSVG('departures.svg', self.m_DepartureFilename)
+        else:
+            for index, departure in enumerate(self.allDepartures):
+                departureDict[K_DEPARTURE_PLACEHOLDER.format(index)] = departure.GetDepartureInformation()
 
-            self.m_RefreshDisplayTimer.Reset()
+        if self.m_TemplateRenderer != None:
+            self.m_DepartureImage = self.m_TemplateRenderer.Render(departureDict)
+            self.DumpImage(self.m_DepartureImage, self.m_DepartureFilename)
+        else:
+            self.m_SvgTemplate.Write(self.m_DepartureSvgFilename, departureDict)
+            utility.ConvertSVG(self.m_DepartureSvgFilename, self.m_DepartureFilename)
+            self.m_DepartureImage = utility.LoadImage(self.m_DepartureFilename)
 
     def FillNodeStation(self):
         '''
-        Create a NodeStation tree of all of the connected station with the timetable.
+        Create a StationGraph of all of the connected station with the timetable.
         :return: None
         '''
 
-        if self.b_CanRefresh == False or len(self.allDepartures) == 0:
+        if len(self.allDepartures) == 0:
             return
 
         logging.info("Fill node station")
 
         initList = list(self.allDepartures[-1].m_Timetable)
         self.CreateNodeStation(initList)
+        if self.m_RootNode == None: #Main station not located, retried at the next update
+            return
 
         for departure in reversed(self.allDepartures):
             self.CreateNodeStation(departure.m_TimetableAfterArrival)
@@ -228,165 +403,215 @@ class DepartureManager:
     def CreateNodeStation(self, _currentTimetable : []):
 
         index = len(_currentTimetable) - 1
-        imageSize = (400, 480)
 
-        if self.m_Tree == None: #Init tree
+        if self.m_RootNode == None: #Init the node of the station, can already be in a graph shared with other stations
             stop = _currentTimetable[index]
 
-            result = self.transportRequest.GetPlacesInformations("{},{}".format(stop.m_StationCode, stop.m_TiplocCode), 'train_station')
-            assert result, "API couldn't return a valid result at the main station code {} {}".format(stop.m_StationCode, stop.m_TiplocCode)
+            #An invalid result of the main station is not cached, it is requested again at the next update
+            place = self.GetPlaceInformation(stop, False)
+            if place == None:
+                logging.error("API couldn't return a valid result at the main station code {} {}".format(stop.m_StationCode, stop.m_TiplocCode))
+                return
 
-            assert 'latitude' in result[0] , "No latitude at station {} {}".format(stop.m_StationCode, stop.m_TiplocCode)
-            self.m_CenterCoordinate = (result[0]['latitude'], result[0]['longitude'])
-
-            self.m_Tree = NodeStation(result[0]['station_code'], self.ConvertCoordinateToPixel(imageSize, self.m_CenterCoordinate, self.m_CenterCoordinate))
+            self.m_CenterCoordinate = (place['latitude'], place['longitude'])
+            self.m_RootNode = self.m_StationGraph.AddNode(NodeStation(place['station_code'], self.m_CenterCoordinate), stop.m_StationCode)
+            self.m_MapProjection = geo.MapProjection(self.m_CenterCoordinate, K_STATION_MAP_SIZE, self.distanceDrawMap)
 
             index -= 1
 
-        radius = 6371.0 # Volumetric Earth radius (Km)
-        degToRad = 0.017453292519943295  # Pi / 180.0
-        refLatitudeRad = self.m_CenterCoordinate[0] * degToRad
+        maxDistance = self.distanceDrawMap * K_STATION_MAP_MARGIN
+
+        #Range-check the stops already located, by the graph or the places cache, in one pass.
+        #The walk stops at the first known stop off the map, no places request is spent beyond it.
+        allKnownPlace = [self.GetKnownPlace(stop) for stop in _currentTimetable[:index + 1]]
+        allDistance = self.m_MapProjection.GetDistances([(place['latitude'], place['longitude']) if place != None else None for place in allKnownPlace])
 
-        previousNode = self.m_Tree
-        while index >= 0:
+        offMapIndices = (allDistance > maxDistance).nonzero()[0]
+        lastIndex = int(offMapIndices[-1]) if len(offMapIndices) != 0 else 0
+
+        previousNode = self.m_RootNode
+        while index >= lastIndex:
             stop = _currentTimetable[index]
 
-            node = self.m_Tree.Search(stop.m_StationCode)
+            node = self.m_StationGraph.Search(stop.m_StationCode)
             if node == None:
-                placeResult = self.transportRequest.GetPlacesInformations("{},{}".format(stop.m_StationCode, stop.m_TiplocCode), 'train_station')
-
-                if placeResult != None: #It appears, sometimes, the API couldn't return a valid result with a station code
+                place = allKnownPlace[index]
+                if place == None:
+                    place = self.GetPlaceInformation(stop)
 
-                    if placeResult[0].get('latitude') == None:
-                        logging.debug("No latitude at station {} {}".format(stop.m_StationCode, stop.m_TiplocCode))
-                        pass
+                if place != None: #It appears, sometimes, the API couldn't return a valid result with a station code
 
-                    coordinateResult = (placeResult[0]['latitude'], placeResult[0]['longitude'])
-                    nodeResult = NodeStation(placeResult[0]['station_code'], self.ConvertCoordinateToPixel(imageSize, coordinateResult, self.m_CenterCoordinate))
+                    coordinateResult = (place['latitude'], place['longitude'])
 
-                    previousNode.AddNode(nodeResult)
+                    nodeResult = self.m_StationGraph.AddNode(NodeStation(place['station_code'], coordinateResult), stop.m_StationCode)
+                    self.m_StationGraph.AddEdge(previousNode, nodeResult)
                     previousNode = nodeResult
 
-                    #Using Haversine formula to calculate distance between 2 points
-                    latitudeRad = coordinateResult[0] * degToRad
-                    deltaLatitudeRad = (latitudeRad - refLatitudeRad) * degToRad
-                    deltaLongitudeRad = ( coordinateResult[1] - self.m_CenterCoordinate[1]) * degToRad
-
-                    #https://www.movable-type.co.uk/scripts/latlong.html
-                    sqrHalfChordLength = math.sin(deltaLatitudeRad / 2.0)  * math.sin(deltaLatitudeRad / 2.0) +\
-                                            math.cos(refLatitudeRad)          * math.cos(radius) *\
-                                            math.sin(deltaLongitudeRad / 2.0) * math.sin(deltaLongitudeRad / 2.0)
-
-                    angularDistance = 2.0 * math.atan2(math.sqrt(sqrHalfChordLength), math.sqrt(1.0 - sqrHalfChordLength))
-
-                    distance = radius * angularDistance
-
                     #Intentionally checked after adding the node for drawing line outside
-                    if distance > (self.distanceDrawMap * 1.414):
+                    if allKnownPlace[index] == None and self.m_MapProjection.GetDistance(coordinateResult) > maxDistance:
                         break
 
                 else:
                     logging.warning("API couldn't return a valid result at the station code {} | {}".format(stop.m_StationCode, stop.m_TiplocCode))
             else:
+                self.m_StationGraph.AddEdge(previousNode, node) #Converging lines
                 previousNode = node
 
             index -= 1
 
-    def ConvertCoordinateToPixel(self, _imageSize: Image.BOX, _coordinates, _offset = (0,0)):
-        ratioPixelPerKm = _imageSize[0] / self.distanceDrawMap
-
-        xMiddle = _imageSize[0] / 2.0
-        yMiddle = _imageSize[1] / 2.0
-
-        radius = 6371.0 # Volumetric Earth radius (Km)
-        degToRad = 0.017453292519943295  # Pi / 180.0
+    def GetKnownPlace(self, _stop):
+        '''
+        Locate a stop without request, from the station graph or the places cache.
+        :return: place dictionary ('station_code', 'latitude', 'longitude') or None if the place is not known
+        '''
+        node = self.m_StationGraph.Search(_stop.m_StationCode)
+        if node != None:
+            return {'station_code': node.m_ID, 'latitude': node.m_Coordinate[0], 'longitude': node.m_Coordinate[1]}
 
-        xPosition = xMiddle + ((_coordinates[1] - _offset[1]) * degToRad * radius * ratioPixelPerKm)
-        yPosition = yMiddle - ((_coordinates[0] - _offset[0]) * degToRad * radius * ratioPixelPerKm)
+        isCached, place = self.m_PlacesCache.Get(_stop.m_StationCode, _stop.m_TiplocCode)
+        return place if isCached else None
 
-        return (xPosition, yPosition)
+    def GetPlaceInformation(self, _stop, _cacheInvalid: bool = True):
+        '''
+        Get the place of a stop, from the places cache first and from the transport API otherwise.
+        An invalid result from the API is also cached to avoid requesting it again.
+        :param _stop: Stop to locate.
+        :param _cacheInvalid: False to neither use nor store an invalid result, the stop is requested until it is located.
+        :return: place dictionary ('station_code', 'latitude', 'longitude') or None if no valid result
+        '''
+        isCached, place = self.m_PlacesCache.Get(_stop.m_StationCode, _stop.m_TiplocCode)
+        if isCached and (place != None or _cacheInvalid):
+            return place
+
+        result = self.transportRequest.GetPlacesInformations("{},{}".format(_stop.m_StationCode, _stop.m_TiplocCode), 'train_station')
+        if result == None: #Request failed, nothing to cache
+            return None
+
+        place = None
+        if len(result) != 0 and result[0].get('latitude') != None:
+            place = {'station_code': result[0]['station_code'],
+                     'latitude': result[0]['latitude'],
+                     'longitude': result[0]['longitude']}
+        else:
+            logging.debug("No latitude at station {} {}".format(_stop.m_StationCode, _stop.m_TiplocCode))
+
+        if place != None or _cacheInvalid:
+            self.m_PlacesCache.Set(_stop.m_StationCode, _stop.m_TiplocCode, place)
+        return place
+
+    def GetNodePixelPosition(self, _node: NodeStation):
+        '''
+        :return: position of the node on the station map, centered on this station
+        '''
+        pixelPosition = self.m_NodePixelPositions.get(_node.m_ID)
+        if pixelPosition == None:
+            pixelPosition = self.m_MapProjection.ProjectPoint(_node.m_Coordinate)
+        return pixelPosition
 
     def DrawStationMap(self):
-        if self.m_Tree == None:
-            logging.warning("No node tree to draw")
+        '''
+        Draw the station network into the cached m_StationMapImage layer.
+        The layer is only redrawn when the station graph has changed since the last draw,
+        the graph can be completed by the other stations sharing it.
+        :return: None
+        '''
+        if self.m_RootNode == None:
+            logging.warning("No station graph to draw")
             return
 
-        if self.b_CanRefresh == False:
+        if self.m_StationMapRevision == self.m_StationGraph.m_Revision:
             return
 
         logging.info("Draw Station Map")
 
-        imageSize = (400, 480)
-        stationMapImg = Image.new('RGB', (imageSize[0], imageSize[1]), (255,255,255))
+        imageSize = K_STATION_MAP_SIZE
+        stationMapImg = Image.new('L', (imageSize[0], imageSize[1]), 255)
         draw = ImageDraw.Draw(stationMapImg)
 
         fontSize = 15
-        font = ImageFont.truetype(r'asset/IBMPlexSans-ExtraLight.ttf', fontSize)
-
-        queue = []
-        queue.append(self.m_Tree)
-
-        while len(queue) != 0:
-            currentNode = queue.pop()
+        if self.m_MapFont == None:
+            self.m_MapFont = ImageFont.truetype(r'asset/IBMPlexSans-ExtraLight.ttf', fontSize)
+        font = self.m_MapFont
+
+        allNode = self.m_StationGraph.m_Nodes
+        allPixelPosition = dict(zip([node.m_ID for node in allNode], self.m_MapProjection.Project([node.m_Coordinate for node in allNode])))
+        self.m_NodePixelPositions = allPixelPosition #Reused by the train positions until the graph changes
+
+        # draw stations connection
+        for lhsNode, rhsNode in self.m_StationGraph.GetEdges():
+            lhsPosition = allPixelPosition[lhsNode.m_ID]
+            rhsPosition = allPixelPosition[rhsNode.m_ID]
+            draw.line((lhsPosition[0], lhsPosition[1], rhsPosition[0], rhsPosition[1]), fill = 0)
+
+        for currentNode in self.m_StationGraph.m_Nodes:
+            pixelPosition = allPixelPosition[currentNode.m_ID]
+            if not (0 <= pixelPosition[0] < imageSize[0] and 0 <= pixelPosition[1] < imageSize[1]): #Station of another map
+                continue
 
             #draw station point
-            cubeSize = 2 if currentNode != self.m_Tree else 6
-            draw.rectangle((currentNode.m_PixelPosition[0] - cubeSize, currentNode.m_PixelPosition[1] - cubeSize, currentNode.m_PixelPosition[0] + cubeSize, currentNode.m_PixelPosition[1] + cubeSize), fill = 0, outline=0, width=3)
-            draw.text((currentNode.m_PixelPosition[0] + 5, currentNode.m_PixelPosition[1] - fontSize), currentNode.m_ID, fill = 0, font = font)
+            cubeSize = 2 if currentNode != self.m_RootNode else 6
+            draw.rectangle((pixelPosition[0] - cubeSize, pixelPosition[1] - cubeSize, pixelPosition[0] + cubeSize, pixelPosition[1] + cubeSize), fill = 0, outline=0, width=3)
+            draw.text((pixelPosition[0] + 5, pixelPosition[1] - fontSize), currentNode.m_ID, fill = 0, font = font)
 
-            for childNode in currentNode.m_ChildNodeStation:
-                queue.append(childNode)
-
-                # draw stations connection
-                draw.line((currentNode.m_PixelPosition[0], currentNode.m_PixelPosition[1], childNode.m_PixelPosition[0], childNode.m_PixelPosition[1]), fill = 0)
-
-        stationMapImg.save(self.m_StationMapFilename)
+        self.m_StationMapImage = stationMapImg
+        self.m_StationMapRevision = self.m_StationGraph.m_Revision
+        self.DumpImage(self.m_StationMapImage, self.m_StationMapFilename)
 
     def DrawTrainPosition(self):
-        if self.m_Tree == None or len(self.allDepartures) == 0:
+        '''
+        Composite the approximate train positions onto a copy of the cached station map layer.
+        :return: None
+        '''
+        self.m_TrainPositionImage = self.m_StationMapImage
+        if self.m_StationMapImage == None or len(self.allDepartures) == 0:
             return
 
         logging.info("Draw Train Position")
-        mapImage = Image.open(self.m_StationMapFilename)
+        mapImage = self.m_StationMapImage.copy() #Keep the station map without train positions
         draw = ImageDraw.Draw(mapImage)
 
-        previousStop = None
-        nextStop = None
+        currentTime = utility.GetCurrentDateTime()
         for departure in self.allDepartures:
-            #Get current and next train station with current time
-            currentTime = utility.GetCurrentDateTime()
-
-            for index in range(len(departure.m_Timetable)):
-                stop = departure.m_Timetable[index]
-                if stop.m_AimedDepartureDatetime > currentTime:
-                    nextStop = stop
-                    break
-
-                previousStop = stop
-
-            if nextStop == None:
+            #Get the previous and next train station with the current time
+            position = departure.GetPosition(currentTime)
+            if position == None:
                 logging.debug("No station code found on departure {} {}".format(departure.m_DestinationName, departure.m_ServiceID))
                 continue
 
-            if nextStop.m_AimedArrivalDatetime == None or previousStop.m_AimedDepartureDatetime == None:
-                continue
+            previousStop, nextStop, timeRatio = position
 
-            previousNodeStation = self.m_Tree.Search(previousStop.m_StationCode)
-            nextNodeStation = self.m_Tree.Search(nextStop.m_StationCode)
+            previousNodeStation = self.m_StationGraph.Search(previousStop.m_StationCode)
+            nextNodeStation = self.m_StationGraph.Search(nextStop.m_StationCode)
 
             if previousNodeStation == None or nextNodeStation == None: #Can be an out of range node station or with no place result
                 continue
 
-            remainingTime = (currentTime - previousStop.m_AimedDepartureDatetime)
-            totalTime = nextStop.m_AimedArrivalDatetime - previousStop.m_AimedDepartureDatetime
+            interpolatedPixelPosition = utility.Lerp(self.GetNodePixelPosition(previousNodeStation), self.GetNodePixelPosition(nextNodeStation), timeRatio)
+            draw.ellipse((interpolatedPixelPosition[0] - 3, interpolatedPixelPosition[1] - 3,interpolatedPixelPosition[0] + 3, interpolatedPixelPosition[1] + 3), fill = 'black')
 
-            timeRatio = remainingTime / totalTime
-            timeRatio = utility.Clamp(timeRatio, 0.0, 1.0)
+        self.m_TrainPositionImage = mapImage
 
-            interpolatedPixelPosition = utility.Lerp(previousNodeStation.m_PixelPosition, nextNodeStation.m_PixelPosition, timeRatio)
-            draw.ellipse((interpolatedPixelPosition[0] - 3, interpolatedPixelPosition[1] - 3,interpolatedPixelPosition[0] + 3, interpolatedPixelPosition[1] + 3), fill = 'black')
+    def CreateFrameImage(self):
+        '''
+        Merge the departures image and the station map with the train positions.
+        :return: the frame Image to display
+        '''
+        if self.m_TrainPositionImage == None:
+            frameImage = self.m_DepartureImage.copy()
+        else:
+            frameImage = utility.MergeImages(self.m_DepartureImage, self.m_TrainPositionImage, box= (250, 0))
 
-        mapImage.save(self.m_StationMapFilename)
+        self.DumpImage(frameImage, self.m_FrameFilename)
+        return frameImage
+
+    def DumpImage(self, _image: Image.Image, _filename: str):
+        '''
+        Save an intermediate image on disk, only if debugDumpImages is set in config.json.
+        :return: None
+        '''
+        if self.b_DebugDumpImages:
+            logging.debug("Dump %s", _filename)
+            _image.save(_filename)
 
     def LoadConfig(self):
         '''
@@ -394,12 +619,7 @@ class DepartureManager:
         :return: json dictionary
         '''
 
-        configFilename = 'config.json'
-        utility.AssertOnFile(configFilename)
-
-        with open(configFilename, 'r') as jsonConfig:
-           data = json.load(jsonConfig)
-           return data
+        return utility.LoadConfig()
 
     def InitDeparturesDictionaries(self):
         '''
@@ -413,20 +633,23 @@ class DepartureManager:
         }
 
         for index in range(self.config['maxDepartures']):
-            templateDict['DEPARTURE_0' + str(index)] = ''
+            templateDict[K_DEPARTURE_PLACEHOLDER.format(index)] = ''
 
         return templateDict
 
     def SleepBehavior(self):
         '''
-        Sleep until the shortest time.
+        Sleep until the next scheduled job.
         :return: None
         '''
-        self.b_CanRefresh = False
-
-        minTime = min(self.m_DepartureRequestTimer.GetRemainingTime(), self.m_RefreshDisplayTimer.GetRemainingTime())
-        minTime = min(minTime, self.m_AgendaTimer.GetRemainingTime())
-        minTime = max(60, minTime) #Clamp value to 60sec minimum
+        minTime = self.GetNextUpdateDelay()
 
         logging.info("Next update in {} seconds\n\n\n\n".format(minTime))
         time.sleep(minTime)
+
+    def GetNextUpdateDelay(self):
+        '''
+        Get the time until the next scheduled job.
+        :return: time in seconds
+        '''
+        return self.m_Scheduler.GetNextDelay()
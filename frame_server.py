@@ -0,0 +1,223 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import hashlib
+import io
+import json
+import logging
+import threading
+
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from PIL import Image
+
+from lib import epdbuffer
+
+K_RENDER_TIME_FORMAT = '%Y%m%dT%H%M%S'
+
+K_FORMAT_PNG = 'png'
+K_FORMAT_EPD = 'epd'
+K_CONTENT_TYPES = {K_FORMAT_PNG: 'image/png',
+                   K_FORMAT_EPD: 'application/octet-stream'}
+
+
+def GetImageDigest(_image: Image.Image):
+    '''
+    :return: digest of the pixels of an image, its mode and size included
+    '''
+    digest = hashlib.sha1('{}{}'.format(_image.mode, _image.size).encode('UTF-8'))
+    digest.update(_image.tobytes())
+    return digest.hexdigest()[:16]
+
+
+class Frame:
+    '''
+    Frame rendered for a station, with its PNG and packed 1-bit EPD representations.
+    The ETags only depend on the pixels, so a frame rendered again without change keeps its ETags.
+    The PNG ETag is the digest of the grayscale image, the EPD one the digest of the dithered 1-bit buffer:
+    a grayscale change lost by the dithering only changes the PNG, and the panels are not refreshed for it.
+    '''
+    def __init__(self, _station: str, _renderTime: datetime, _image: Image.Image, _epdSize):
+        '''
+        :param _epdSize: (width, height) of the panel, as in EPD.getbuffer.
+        '''
+        self.m_Station = _station
+        self.m_RenderTime = _renderTime
+        self.m_Image = _image
+
+        self.m_EpdBuffer = bytes(epdbuffer.pack_image(_image, _epdSize[0], _epdSize[1]))
+        self.m_Digests = {K_FORMAT_PNG: GetImageDigest(_image),
+                          K_FORMAT_EPD: hashlib.sha1(self.m_EpdBuffer).hexdigest()[:16]}
+
+        self.m_Lock = threading.Lock()
+        self.m_Png = None #Encoded on the first request
+
+    def GetETag(self, _format: str):
+        return '"{}-{}"'.format(self.m_Digests[_format], _format)
+
+    def GetContent(self, _format: str):
+        '''
+        :param _format: K_FORMAT_PNG or K_FORMAT_EPD.
+        :return: bytes of the frame in this format
+        '''
+        if _format == K_FORMAT_EPD:
+            return self.m_EpdBuffer
+
+        with self.m_Lock:
+            if self.m_Png == None:
+                output = io.BytesIO()
+                self.m_Image.save(output, format='PNG', optimize=True)
+                self.m_Png = output.getvalue()
+            return self.m_Png
+
+    def GetDescription(self):
+        return {'station': self.m_Station,
+                'render_time': self.m_RenderTime.strftime(K_RENDER_TIME_FORMAT),
+                'etag': self.m_Digests[K_FORMAT_PNG],
+                'epd_etag': self.m_Digests[K_FORMAT_EPD]}
+
+
+class FrameCache:
+    '''Last frames rendered per station, keyed by station code and render time'''
+    def __init__(self, _history: int, _epdSize):
+        '''
+        :param _history: number of frames kept per station.
+        :param _epdSize: (width, height) of the panel of the clients.
+        '''
+        self.m_History = max(1, _history)
+        self.m_EpdSize = _epdSize
+
+        self.m_Lock = threading.Lock()
+        self.m_Frames = {} #station code -> OrderedDict(render time string -> Frame), oldest first
+
+    def Add(self, _station: str, _renderTime: datetime, _image: Image.Image):
+        '''
+        Store a new frame of a station, the oldest one is removed when the history is full.
+        :return: the Frame stored
+        '''
+        frame = Frame(_station, _renderTime, _image, self.m_EpdSize)
+
+        with self.m_Lock:
+            allFrames = self.m_Frames.setdefault(_station, OrderedDict())
+            if len(allFrames) != 0:
+                latestFrame = next(reversed(allFrames.values()))
+                if latestFrame.m_Digests[K_FORMAT_PNG] == frame.m_Digests[K_FORMAT_PNG]:
+                    frame.m_Png = latestFrame.m_Png #Same pixels, keep the PNG already encoded
+
+            allFrames[_renderTime.strftime(K_RENDER_TIME_FORMAT)] = frame
+            while len(allFrames) > self.m_History:
+                allFrames.popitem(last=False)
+
+        return frame
+
+    def Get(self, _station: str, _renderTime: str = None):
+        '''
+        :param _renderTime: render time formatted with K_RENDER_TIME_FORMAT, the latest frame if None.
+        :return: the Frame or None if not found
+        '''
+        with self.m_Lock:
+            allFrames = self.m_Frames.get(_station)
+            if not allFrames:
+                return None
+
+            if _renderTime == None:
+                return next(reversed(allFrames.values()))
+            return allFrames.get(_renderTime)
+
+    def GetDescriptions(self):
+        '''
+        :return: list of the frames kept, per station
+        '''
+        with self.m_Lock:
+            return {station: [frame.GetDescription() for frame in allFrames.values()] for station, allFrames in self.m_Frames.items()}
+
+
+class FrameRequestHandler(BaseHTTPRequestHandler):
+    '''
+    GET /frames                              -> JSON list of the frames kept per station
+    GET /frame/<station>.<png|epd>           -> latest frame of the station
+    GET /frame/<station>/<renderTime>.<png|epd> -> a previous frame of the station
+    '''
+    m_FrameCache = None #Set by FrameServer
+
+    def do_GET(self):
+        path = urlsplit(self.path).path.strip('/').split('/')
+
+        if path == ['frames']:
+            self.SendContent(json.dumps(self.m_FrameCache.GetDescriptions()).encode('UTF-8'), 'application/json')
+            return
+
+        if len(path) not in (2, 3) or path[0] != 'frame' or '.' not in path[-1]:
+            self.send_error(404)
+            return
+
+        name, frameFormat = path[-1].rsplit('.', 1)
+        if frameFormat not in K_CONTENT_TYPES:
+            self.send_error(404, "Unknown format, should be png or epd")
+            return
+
+        station, renderTime = (name, None) if len(path) == 2 else (path[1], name)
+        frame = self.m_FrameCache.Get(station, renderTime)
+        if frame == None:
+            self.send_error(404, "No frame for {}".format(station))
+            return
+
+        etag = frame.GetETag(frameFormat)
+        if self.IsNotModified(etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.SendContent(frame.GetContent(frameFormat), K_CONTENT_TYPES[frameFormat],
+                         {'ETag': etag,
+                          'X-Render-Time': frame.m_RenderTime.strftime(K_RENDER_TIME_FORMAT)})
+
+    def IsNotModified(self, _etag: str):
+        ifNoneMatch = self.headers.get('If-None-Match')
+        if ifNoneMatch == None:
+            return False
+
+        allETag = [etag.strip() for etag in ifNoneMatch.split(',')]
+        return '*' in allETag or _etag in allETag or ('W/' + _etag) in allETag
+
+    def SendContent(self, _content: bytes, _contentType: str, _headers: dict = {}):
+        self.send_response(200)
+        self.send_header('Content-Type', _contentType)
+        self.send_header('Content-Length', str(len(_content)))
+        self.send_header('Cache-Control', 'no-cache') #Always revalidated with the ETag
+        for key, value in _headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(_content)
+
+    def log_message(self, _format, *_args):
+        logging.debug("Frame server %s - %s", self.address_string(), _format % _args)
+
+
+class FrameServer:
+    '''Serve the frames of a FrameCache over HTTP, from a background thread'''
+    def __init__(self, _frameCache: FrameCache, _configFrameServer: dict):
+        '''
+        :param _configFrameServer: 'frameServer' part of config.json
+        '''
+        handler = type('BoundFrameRequestHandler', (FrameRequestHandler,), {'m_FrameCache': _frameCache})
+        self.m_Server = ThreadingHTTPServer((_configFrameServer['host'], _configFrameServer['port']), handler)
+        self.m_Server.daemon_threads = True
+        self.m_Thread = None
+
+    def Start(self):
+        host, port = self.m_Server.server_address[:2]
+        logging.info("Frame server on http://{}:{}/frames".format(host, port))
+
+        self.m_Thread = threading.Thread(target=self.m_Server.serve_forever, name='FrameServer', daemon=True)
+        self.m_Thread.start()
+
+    def Close(self):
+        if self.m_Thread != None:
+            self.m_Server.shutdown()
+            self.m_Thread = None
+        self.m_Server.server_close()
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import numpy
+
+K_EARTH_RADIUS = 6371.0 #Volumetric Earth radius (Km)
+
+def ToArrays(_coordinates: list):
+    '''
+    :param _coordinates: list of (latitude, longitude) in degrees, None for an unknown coordinate.
+    :return: (latitudes, longitudes) arrays in radians, NaN for an unknown coordinate
+    '''
+    allCoordinate = numpy.array([coordinate if coordinate != None else (numpy.nan, numpy.nan) for coordinate in _coordinates],
+                                dtype=numpy.float64).reshape(-1, 2)
+    allCoordinate = numpy.radians(allCoordinate)
+    return allCoordinate[:, 0], allCoordinate[:, 1]
+
+
+class MapProjection:
+    '''
+    Equirectangular projection of a station map, centered on a station.
+    The coordinates are projected and range-checked in batches.
+    '''
+    def __init__(self, _center: tuple, _imageSize: tuple, _distanceDrawMap: float):
+        '''
+        :param _center: (latitude, longitude) of the station in the center of the map.
+        :param _imageSize: (width, height) of the map in pixel.
+        :param _distanceDrawMap: distance in Km covered by the width of the map.
+        '''
+        self.m_Center = _center
+        self.m_CenterLatitude, self.m_CenterLongitude = numpy.radians(_center)
+        self.m_CosCenterLatitude = numpy.cos(self.m_CenterLatitude)
+
+        self.m_Middle = (_imageSize[0] / 2.0, _imageSize[1] / 2.0)
+        self.m_PixelPerRadian = K_EARTH_RADIUS * _imageSize[0] / _distanceDrawMap
+
+    def GetDistances(self, _coordinates: list):
+        '''
+        Great-circle distance from the center, with the haversine formula.
+        https://www.movable-type.co.uk/scripts/latlong.html
+        :param _coordinates: list of (latitude, longitude), None for an unknown coordinate.
+        :return: array of the distances in Km, NaN for an unknown coordinate
+        '''
+        latitudes, longitudes = ToArrays(_coordinates)
+
+        sinHalfDeltaLatitude = numpy.sin((latitudes - self.m_CenterLatitude) / 2.0)
+        sinHalfDeltaLongitude = numpy.sin((longitudes - self.m_CenterLongitude) / 2.0)
+        sqrHalfChordLength = sinHalfDeltaLatitude * sinHalfDeltaLatitude +\
+                             self.m_CosCenterLatitude * numpy.cos(latitudes) * sinHalfDeltaLongitude * sinHalfDeltaLongitude
+
+        angularDistance = 2.0 * numpy.arctan2(numpy.sqrt(sqrHalfChordLength), numpy.sqrt(1.0 - sqrHalfChordLength))
+        return K_EARTH_RADIUS * angularDistance
+
+    def GetDistance(self, _coordinate: tuple):
+        '''
+        :return: distance in Km of a single coordinate from the center
+        '''
+        return float(self.GetDistances([_coordinate])[0])
+
+    def Project(self, _coordinates: list):
+        '''
+        :param _coordinates: list of (latitude, longitude).
+        :return: list of the (x, y) pixel positions, outside of the map for a far station
+        '''
+        latitudes, longitudes = ToArrays(_coordinates)
+
+        #Longitudes are scaled at the center latitude so a Km is the same length in both axes
+        xPositions = self.m_Middle[0] + (longitudes - self.m_CenterLongitude) * self.m_CosCenterLatitude * self.m_PixelPerRadian
+        yPositions = self.m_Middle[1] - (latitudes - self.m_CenterLatitude) * self.m_PixelPerRadian
+        return list(zip(xPositions.tolist(), yPositions.tolist()))
+
+    def ProjectPoint(self, _coordinate: tuple):
+        '''
+        :return: (x, y) pixel position of a single coordinate
+        '''
+        return self.Project([_coordinate])[0]
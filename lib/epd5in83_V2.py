@@ -28,6 +28,7 @@
 #
 
 import logging
+from . import epdbuffer
 from . import epdconfig
 
 # Display resolution
@@ -36,6 +37,17 @@ EPD_HEIGHT      = 480
 
 logger = logging.getLogger(__name__)
 
+# All-zero frame, the old data of every refresh, allocated once
+_blank_buffers = {}
+
+def get_blank_buffer(width, height):
+    size = int(width / 8) * height
+    buffer = _blank_buffers.get(size)
+    if buffer is None:
+        buffer = bytes(size)
+        _blank_buffers[size] = buffer
+    return buffer
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -44,6 +56,7 @@ class EPD:
         self.cs_pin = epdconfig.CS_PIN
         self.width = EPD_WIDTH
         self.height = EPD_HEIGHT
+        self.blank_buffer = get_blank_buffer(self.width, self.height)
     
     # Hardware reset
     def reset(self):
@@ -66,12 +79,17 @@ class EPD:
         epdconfig.spi_writebyte([data])
         epdconfig.digital_write(self.cs_pin, 1)
 
-    # send a lot of data   
+    # send a lot of data, bytes/bytearray/memoryview are sent without copy
     def send_data2(self, data):
         epdconfig.digital_write(self.dc_pin, 1)
         epdconfig.digital_write(self.cs_pin, 0)
         epdconfig.spi_writebyte2(data)
         epdconfig.digital_write(self.cs_pin, 1)
+
+    # command and its parameters, the parameters in a single CS assertion
+    def send_command_data(self, command, data):
+        self.send_command(command)
+        self.send_data2(data)
         
     def ReadBusy(self):
         logger.debug("e-Paper busy")
@@ -90,84 +108,54 @@ class EPD:
         # EPD hardware init start
         self.reset()
         
-        self.send_command(0x01)    #POWER SETTING
-        self.send_data (0x07)
-        self.send_data (0x07)  #VGH=20V,VGL=-20V
-        self.send_data (0x3f)  #VDH=15V
-        self.send_data (0x3f)  #VDL=-15V
+        self.send_command_data(0x01, b'\x07\x07\x3f\x3f')    #POWER SETTING: VGH=20V,VGL=-20V, VDH=15V, VDL=-15V
 
         self.send_command(0x04)    #POWER ON
         epdconfig.delay_ms(100) 
         self.ReadBusy()   #waiting for the electronic paper IC to release the idle signal
 
-        self.send_command(0X00)    #PANNEL SETTING
-        self.send_data(0x1F)   #KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
+        self.send_command_data(0X00, b'\x1F')    #PANNEL SETTING: KW-3f   KWR-2F	BWROTP 0f	BWOTP 1f
 
-        self.send_command(0x61)    #tres
-        self.send_data (0x02)		#source 648
-        self.send_data (0x88)
-        self.send_data (0x01)		#gate 480
-        self.send_data (0xE0)
+        self.send_command_data(0x61, b'\x02\x88\x01\xE0')    #tres: source 648, gate 480
 
-        self.send_command(0X15)		
-        self.send_data(0x00)		
+        self.send_command_data(0X15, b'\x00')
 
-        self.send_command(0X50)			#VCOM AND DATA INTERVAL SETTING
-        self.send_data(0x10)
-        self.send_data(0x07)
+        self.send_command_data(0X50, b'\x10\x07')			#VCOM AND DATA INTERVAL SETTING
 
-        self.send_command(0X60)			#TCON SETTING
-        self.send_data(0x22)
+        self.send_command_data(0X60, b'\x22')			#TCON SETTING
             
         # EPD hardware init end
         return 0
 
     def getbuffer(self, image):
         # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width/8) * self.height)
-        image_monocolor = image.convert('1')
-        imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
-        if(imwidth == self.width and imheight == self.height):
-            logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
-        elif(imwidth == self.height and imheight == self.width):
-            logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy*self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf
+        logger.debug("imwidth = %d, imheight = %d", image.size[0], image.size[1])
+        return epdbuffer.pack_image(image, self.width, self.height)
         
     def display(self, image):
-        buf = [0x00] * int(self.width * self.height / 8)
-        for i in range(0, int(self.width * self.height / 8)):
-            buf[i] = ~image[i]
-        self.send_command(0x10)
-        self.send_data2([0x00] * int(self.width * self.height / 8))
-        self.send_command(0x13)
-        self.send_data2(buf)
+        self.send_command_data(0x10, self.blank_buffer)
+        self.send_command_data(0x13, epdbuffer.invert_buffer(image))
         self.TurnOnDisplay()
         
     def Clear(self):
-        self.send_command(0x10)
-        self.send_data2([0x00] * int(self.width * self.height / 8))
-        self.send_command(0x13)
-        self.send_data2([0x00] * int(self.width * self.height / 8))
+        self.send_command_data(0x10, self.blank_buffer)
+        self.send_command_data(0x13, self.blank_buffer)
         self.TurnOnDisplay()
 
+    def power_on(self):
+        self.send_command(0x04) # POWER_ON
+        epdconfig.delay_ms(100)
+        self.ReadBusy()
+
+    # Light sleep: the settings and the SPI/GPIO module are kept, wake up with power_on()
+    def power_off(self):
+        self.send_command(0x02) # POWER_OFF
+        self.ReadBusy()
+
     def sleep(self):
         self.send_command(0x02) # POWER_OFF
         self.ReadBusy()
-        self.send_command(0x07) # DEEP_SLEEP
-        self.send_data(0XA5)
+        self.send_command_data(0x07, b'\xA5') # DEEP_SLEEP
         
         epdconfig.delay_ms(2000)
         epdconfig.module_exit()
@@ -0,0 +1,33 @@
+# *****************************************************************************
+# * | File        :   epdbuffer.py
+# * | Function    :   Frame buffer packing for the 1-bit e-Paper displays
+# * | Info        :   No hardware dependency, usable without the display
+# -----------------------------------------------------------------------------
+
+from PIL import Image
+
+# 0xFF - byte, for bytes.translate
+INVERT_TABLE = bytes(range(0xFF, -1, -1))
+
+def pack_image(image, width, height):
+    """Pack an image into the 1 bit per pixel buffer of a width x height panel.
+
+    A pixel set to 1 is white, the most significant bit is the left pixel.
+    A height x width image is rotated into the panel orientation, any other
+    size gives a blank (white) buffer.
+    """
+    image_monocolor = image.convert('1')
+    imwidth, imheight = image_monocolor.size
+    if(imwidth == width and imheight == height):
+        return bytearray(image_monocolor.tobytes())
+    elif(imwidth == height and imheight == width):
+        return bytearray(image_monocolor.transpose(Image.ROTATE_90).tobytes())
+    return bytearray([0xFF]) * (int(width/8) * height)
+
+def invert_buffer(buf):
+    """Invert every byte of a packed buffer"""
+    if not isinstance(buf, (bytes, bytearray)):
+        buf = bytes(buf)
+    return buf.translate(INVERT_TABLE)
+
+### END OF FILE ###
@@ -32,6 +32,22 @@ import logging
 import sys
 import time
 
+from .epdplatform import is_raspberry_pi
+
+# SPI clock, the panel controller accepts up to 20 MHz
+SPI_SPEED_HZ = int(os.environ.get('EPD_SPI_HZ', 4000000))
+
+# Default transfer size of the spidev kernel module
+SPIDEV_BUFSIZ = 4096
+
+def read_spidev_bufsiz():
+    """Largest transfer of the spidev kernel module, /sys/module/spidev/parameters/bufsiz"""
+    try:
+        with open('/sys/module/spidev/parameters/bufsiz') as bufsiz_file:
+            return int(bufsiz_file.read())
+    except (OSError, ValueError):
+        return SPIDEV_BUFSIZ
+
 
 class RaspberryPi:
     # Pin definition
@@ -46,6 +62,8 @@ class RaspberryPi:
 
         self.GPIO = RPi.GPIO
         self.SPI = spidev.SpiDev()
+        self.max_speed_hz = SPI_SPEED_HZ
+        self.bufsiz = read_spidev_bufsiz()
 
     def digital_write(self, pin, value):
         self.GPIO.output(pin, value)
@@ -59,8 +77,15 @@ class RaspberryPi:
     def spi_writebyte(self, data):
         self.SPI.writebytes(data)
 
+    # bulk transfer of a bytes-like buffer, in slices of the spidev buffer without copy
     def spi_writebyte2(self, data):
-        self.SPI.writebytes2(data)
+        if len(data) <= self.bufsiz:
+            self.SPI.writebytes2(data)
+            return
+
+        view = memoryview(data) if not isinstance(data, list) else data
+        for offset in range(0, len(view), self.bufsiz):
+            self.SPI.writebytes2(view[offset:offset + self.bufsiz])
 
     def module_init(self):
         self.GPIO.setmode(self.GPIO.BCM)
@@ -72,7 +97,7 @@ class RaspberryPi:
 
         # SPI device, bus = 0, device = 0
         self.SPI.open(0, 0)
-        self.SPI.max_speed_hz = 4000000
+        self.SPI.max_speed_hz = self.max_speed_hz
         self.SPI.mode = 0b00
         return 0
 
@@ -87,10 +112,30 @@ class RaspberryPi:
         self.GPIO.cleanup()
 
 
-implementation = RaspberryPi()
+def create_implementation(backend='auto'):
+    """
+    backend: 'raspberrypi', 'simulated' or 'auto' for the Raspberry Pi when detected and the simulation otherwise.
+    """
+    if backend == 'auto':
+        backend = 'raspberrypi' if is_raspberry_pi() else 'simulated'
+
+    if backend == 'raspberrypi':
+        return RaspberryPi()
+    if backend == 'simulated':
+        from .epdsimulator import SimulatedPanel
+        return SimulatedPanel(max_speed_hz=SPI_SPEED_HZ)
+    raise ValueError("Unknown e-Paper backend {}".format(backend))
+
+def set_implementation(new_implementation):
+    """Bind the functions of the module to a hardware backend, the drivers call them through the module"""
+    global implementation
+    implementation = new_implementation
+    for func in [x for x in dir(implementation) if not x.startswith('_')]:
+        setattr(sys.modules[__name__], func, getattr(implementation, func))
+
 
-for func in [x for x in dir(implementation) if not x.startswith('_')]:
-    setattr(sys.modules[__name__], func, getattr(implementation, func))
+# EPD_BACKEND=simulated runs the drivers without the hardware
+set_implementation(create_implementation(os.environ.get('EPD_BACKEND', 'auto')))
 
 
 ### END OF FILE ###
@@ -0,0 +1,15 @@
+# *****************************************************************************
+# * | File        :   epdplatform.py
+# * | Function    :   Detection of the hardware the e-Paper display is driven from
+# * | Info        :   No hardware dependency, importable without the display
+# -----------------------------------------------------------------------------
+
+def is_raspberry_pi():
+    """True on a Raspberry Pi, from the model of the device tree"""
+    try:
+        with open('/proc/device-tree/model', 'rb') as model_file:
+            return b'Raspberry Pi' in model_file.read()
+    except OSError:
+        return False
+
+### END OF FILE ###
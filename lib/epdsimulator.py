@@ -0,0 +1,170 @@
+# *****************************************************************************
+# * | File        :   epdsimulator.py
+# * | Function    :   Simulated hardware interface of the e-Paper displays
+# * | Info        :   Same interface as epdconfig.RaspberryPi, no hardware dependency.
+# *                   Records the SPI traffic, models the busy pin and keeps the
+# *                   displayed frame, to measure the driver without the panel.
+# -----------------------------------------------------------------------------
+
+import logging
+import time
+
+from PIL import Image
+
+# Commands interpreted by the simulated panel (UC8179 controller of the 5.83" V2)
+CMD_POWER_OFF = 0x02
+CMD_POWER_ON = 0x04
+CMD_DEEP_SLEEP = 0x07
+CMD_OLD_DATA = 0x10
+CMD_REFRESH = 0x12
+CMD_NEW_DATA = 0x13
+CMD_RESOLUTION = 0x61
+
+# Approximate time in seconds the busy pin stays low after a command
+BUSY_TIMES = {CMD_POWER_OFF: 0.05,
+              CMD_POWER_ON: 0.08,
+              CMD_REFRESH: 3.5}
+
+
+class SimulatedStats:
+    """Counters of the simulated panel, reset with SimulatedPanel.reset_stats()"""
+    def __init__(self):
+        self.commands = 0
+        self.data_bytes = 0
+        self.transfers = 0          # SPI calls, spi_writebyte and spi_writebyte2
+        self.transfer_time = 0.0    # time on the SPI bus at max_speed_hz
+        self.busy_time = 0.0        # time waited while the busy pin is low
+        self.delay_time = 0.0       # time of all the delay_ms calls, busy waits included
+        self.module_inits = 0
+        self.module_exits = 0
+        self.refreshes = 0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class SimulatedPanel:
+    # Pin definition, same as RaspberryPi
+    RST_PIN         = 17
+    DC_PIN          = 25
+    CS_PIN          = 8
+    BUSY_PIN        = 24
+
+    def __init__(self, realtime=False, frame_filename=None, max_speed_hz=4000000, bufsiz=4096):
+        """
+        realtime: sleep in delay_ms like the hardware, otherwise only a virtual clock advances.
+        frame_filename: file the frame is saved in after each refresh, None to keep it in memory only.
+        max_speed_hz: SPI clock the transfer time is computed with.
+        bufsiz: largest transfer, as the spidev buffer size.
+        """
+        self.realtime = realtime
+        self.frame_filename = frame_filename
+        self.max_speed_hz = max_speed_hz
+        self.bufsiz = bufsiz
+
+        self.clock = 0.0            # virtual time in seconds
+        self.busy_until = 0.0
+        self.pins = {self.RST_PIN: 0, self.DC_PIN: 0, self.CS_PIN: 1}
+        self.record = False
+        self.transactions = []      # (is_data, bytes) of each transfer, only when record is set
+        self.stats = SimulatedStats()
+
+        self.width = 0
+        self.height = 0
+        self.command = None         # last command, the following data belong to it
+        self.data = {}              # command -> bytearray of the data received since the command
+        self.frame = None           # bytes of the new data displayed by the last refresh
+
+    def reset_stats(self):
+        self.stats = SimulatedStats()
+        self.transactions = []
+
+    def digital_write(self, pin, value):
+        self.pins[pin] = value
+
+    def digital_read(self, pin):
+        if pin == self.BUSY_PIN:
+            return 0 if self.clock < self.busy_until else 1
+        return self.pins.get(pin, 0)
+
+    def delay_ms(self, delaytime):
+        delay = delaytime / 1000.0
+        if self.clock < self.busy_until:
+            self.stats.busy_time += min(delay, self.busy_until - self.clock)
+        self.stats.delay_time += delay
+
+        self.clock += delay
+        if self.realtime:
+            time.sleep(delay)
+
+    def spi_writebyte(self, data):
+        self.write(data)
+
+    # sliced to the spidev buffer size, as RaspberryPi.spi_writebyte2
+    def spi_writebyte2(self, data):
+        view = memoryview(data) if not isinstance(data, list) else data
+        for offset in range(0, len(view), self.bufsiz):
+            self.write(view[offset:offset + self.bufsiz])
+
+    def write(self, data):
+        payload = bytes(data) if isinstance(data, list) else data
+        is_data = self.pins[self.DC_PIN] == 1
+
+        self.stats.transfers += 1
+        self.stats.transfer_time += len(payload) * 8.0 / self.max_speed_hz
+        if self.record:
+            self.transactions.append((is_data, bytes(payload)))
+
+        if is_data:
+            self.stats.data_bytes += len(payload)
+            if self.command != None:
+                self.data[self.command] += payload
+            return
+
+        for command in payload:
+            self.run_command(command)
+
+    def run_command(self, command):
+        self.stats.commands += 1
+        self.command = command
+        self.data[command] = bytearray()
+
+        if command in BUSY_TIMES:
+            self.busy_until = self.clock + BUSY_TIMES[command]
+
+        if command == CMD_REFRESH:
+            self.refresh()
+
+    def refresh(self):
+        self.stats.refreshes += 1
+
+        resolution = self.data.get(CMD_RESOLUTION, b'')
+        if len(resolution) >= 4:
+            self.width = (resolution[0] << 8) | resolution[1]
+            self.height = (resolution[2] << 8) | resolution[3]
+
+        self.frame = bytes(self.data.get(CMD_NEW_DATA, b''))
+        if self.frame_filename != None:
+            image = self.get_frame()
+            if image != None:
+                image.save(self.frame_filename)
+
+    def get_frame(self):
+        """Image of the last refreshed frame, None if no valid frame was displayed"""
+        if self.frame == None or self.width == 0 or len(self.frame) != self.width // 8 * self.height:
+            return None
+        # The new data are inverted by the driver: a bit set to 1 is black
+        image = Image.frombytes('1', (self.width, self.height), self.frame)
+        return Image.eval(image.convert('L'), lambda value: 255 - value).convert('1')
+
+    def module_init(self):
+        self.stats.module_inits += 1
+        return 0
+
+    def module_exit(self):
+        logging.debug("simulated spi end")
+        self.stats.module_exits += 1
+        self.pins[self.RST_PIN] = 0
+        self.pins[self.DC_PIN] = 0
+
+### END OF FILE ###
@@ -4,24 +4,51 @@
 import logging
 
 from departure_manager import DepartureManager
-from utility import SetupLogging
+from multi_station import MultiStationManager
+from utility import LoadConfig, SetupLogging
 
 def main():
     SetupLogging(logging.INFO)
 
-    departureManager = DepartureManager()
+    config = LoadConfig()
+    if config['multiStation']['enabled']:
+        departureManager = MultiStationManager(config)
+    else:
+        departureManager = DepartureManager(config)
+
+    frameServer = None
+    if config['frameServer']['enabled']:
+        from frame_server import FrameServer
+        frameServer = FrameServer(departureManager.m_Services.m_FrameCache, config['frameServer'])
+        frameServer.Start()
+
+    #The asyncio runtime refreshes the e-Paper while the next frame is requested and drawn
+    runner = departureManager
+    if config['runtime']['asyncio']:
+        from async_runtime import AsyncRuntime
+        runner = AsyncRuntime(departureManager)
 
     try:
-        while True:
-            departureManager.Update()
+        if runner is departureManager:
+            while True:
+                departureManager.Update()
+        else:
+            runner.Run()
 
     except IOError as e:
         logging.exception(e)
+        Close(runner, frameServer)
         exit()
 
     except KeyboardInterrupt:
         logging.debug("Keyboard Interrupt")
+        Close(runner, frameServer)
         exit()
 
+def Close(_runner, _frameServer):
+    if _frameServer != None:
+        _frameServer.Close()
+    _runner.Close()
+
 if __name__ == "__main__":
     main()
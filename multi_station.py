@@ -0,0 +1,94 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import copy
+import logging
+import time
+
+import tracing
+import utility
+from departure_manager import DepartureManager
+from shared_services import SharedServices
+
+
+class MultiStationManager:
+    '''
+    Drive several station boards from a single process.
+    The stations share the HTTP session, the API quota, the places and timetable caches and the station graph,
+    so a service calling at several stations is requested only once.
+    '''
+    def __init__(self, _config: dict = None):
+        '''
+        :param _config: configuration dictionary, 'config.json' is loaded if None.
+        The stations are listed in multiStation.stations, each one overriding the transportRequest part.
+        '''
+        self.config = _config if _config != None else utility.LoadConfig()
+
+        allStationConfig = self.config['multiStation']['stations']
+        assert len(allStationConfig) != 0, "No station in multiStation.stations. Check config.json"
+        assert sum(1 for stationConfig in allStationConfig if stationConfig['epaper']) <= 1, "Only one station can be displayed on the e-Paper"
+
+        self.m_Services = SharedServices(self.config, len(allStationConfig))
+
+        self.m_Managers = []
+        for stationConfig in allStationConfig:
+            manager = DepartureManager(self.CreateStationConfig(stationConfig), self.m_Services)
+            manager.SetOutputPrefix("{}_".format(stationConfig['station_code']))
+            self.m_Managers.append(manager)
+
+        logging.info("Multi-station mode: {}".format(', '.join(stationConfig['station_code'] for stationConfig in allStationConfig)))
+
+    def CreateStationConfig(self, _stationConfig: dict):
+        '''
+        :param _stationConfig: station entry of multiStation.stations.
+        :return: configuration dictionary of the station
+        '''
+        config = copy.deepcopy(self.config)
+        config['transportRequest']['station_code'] = _stationConfig['station_code']
+        config['transportRequest']['calling_at'] = _stationConfig['calling_at']
+        config['epaper']['enabled'] = _stationConfig['epaper']
+        return config
+
+    def Update(self):
+        with tracing.Cycle():
+            self.RunDueJobs()
+        self.m_Services.Flush()
+
+        self.SleepBehavior()
+
+    def RunDueJobs(self):
+        '''
+        Run the due jobs of each station, one after the other.
+        :return: None
+        '''
+        for manager in self.m_Managers:
+            with tracing.Span('Station', station=manager.transportRequest.m_StationCode):
+                manager.RunDueJobs()
+
+    def GetStations(self):
+        '''
+        :return: list of the DepartureManager of each station
+        '''
+        return self.m_Managers
+
+    def Close(self):
+        for manager in self.m_Managers:
+            manager.Close()
+        self.m_Services.Close()
+
+    def SleepBehavior(self):
+        '''
+        Sleep until the next scheduled job of all the stations.
+        :return: None
+        '''
+        minTime = self.GetNextUpdateDelay()
+
+        logging.info("Next update in {} seconds\n\n\n\n".format(minTime))
+        time.sleep(minTime)
+
+    def GetNextUpdateDelay(self):
+        '''
+        Get the time until the next scheduled job of all the stations.
+        :return: time in seconds
+        '''
+        return min(manager.GetNextUpdateDelay() for manager in self.m_Managers)
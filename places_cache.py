@@ -0,0 +1,73 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import sqlite3
+import threading
+import time
+
+
+class PlacesCache:
+    '''Persistent cache of the places requests, keyed by station code and tiploc code'''
+
+    def __init__(self, _filename: str, _timeToLive: float, _negativeTimeToLive: float):
+        '''
+        :param _filename: SQLite database file, created if it does not exist.
+        :param _timeToLive: validity in seconds of a valid place.
+        :param _negativeTimeToLive: validity in seconds of a place the API couldn't return.
+        '''
+        self.m_TimeToLive = _timeToLive
+        self.m_NegativeTimeToLive = _negativeTimeToLive
+
+        self.m_Lock = threading.Lock()
+        self.m_Connection = sqlite3.connect(_filename, check_same_thread=False)
+        self.m_Connection.execute('CREATE TABLE IF NOT EXISTS places ('
+                                  'station_code TEXT NOT NULL, '
+                                  'tiploc_code TEXT NOT NULL, '
+                                  'result_code TEXT, '
+                                  'latitude REAL, '
+                                  'longitude REAL, '
+                                  'timestamp REAL NOT NULL, '
+                                  'PRIMARY KEY (station_code, tiploc_code))')
+        self.m_Connection.commit()
+
+    def Get(self, _stationCode: str, _tiplocCode: str):
+        '''
+        Search a place in the cache.
+        :param _stationCode: station code of the stop.
+        :param _tiplocCode: tiploc code of the stop.
+        :return: a tuple (isCached, place). place is a dictionary ('station_code', 'latitude', 'longitude') or None for a cached invalid result
+        '''
+        with self.m_Lock:
+            row = self.m_Connection.execute('SELECT result_code, latitude, longitude, timestamp FROM places '
+                                            'WHERE station_code = ? AND tiploc_code = ?',
+                                            (_stationCode, _tiplocCode or '')).fetchone()
+        if row == None:
+            return False, None
+
+        resultCode, latitude, longitude, timestamp = row
+        isNegative = latitude == None
+        timeToLive = self.m_NegativeTimeToLive if isNegative else self.m_TimeToLive
+        if time.time() - timestamp > timeToLive:
+            return False, None
+
+        if isNegative:
+            return True, None
+
+        return True, {'station_code': resultCode, 'latitude': latitude, 'longitude': longitude}
+
+    def Set(self, _stationCode: str, _tiplocCode: str, _place):
+        '''
+        Store a place in the cache.
+        :param _stationCode: station code of the stop.
+        :param _tiplocCode: tiploc code of the stop.
+        :param _place: dictionary ('station_code', 'latitude', 'longitude') or None to cache an invalid result.
+        :return: None
+        '''
+        if _place == None:
+            values = (_stationCode, _tiplocCode or '', None, None, None, time.time())
+        else:
+            values = (_stationCode, _tiplocCode or '', _place['station_code'], _place['latitude'], _place['longitude'], time.time())
+
+        with self.m_Lock:
+            self.m_Connection.execute('INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?, ?, ?)', values)
+            self.m_Connection.commit()
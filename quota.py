@@ -0,0 +1,191 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import json
+import logging
+import os
+import threading
+
+from datetime import datetime, timedelta
+
+import utility
+
+K_ENDPOINT_LIVE = 'live'
+K_ENDPOINT_TIMETABLE = 'timetable'
+K_ENDPOINT_PLACES = 'places'
+K_ALL_ENDPOINTS = (K_ENDPOINT_LIVE, K_ENDPOINT_TIMETABLE, K_ENDPOINT_PLACES)
+
+
+class QuotaLedger:
+    '''
+    Count the transport API requests per endpoint for the current day, persisted across restarts.
+    The counters are saved by Flush, once per update cycle, not on each request.
+    '''
+
+    def __init__(self, _filename: str, _dailyLimit: int):
+        '''
+        :param _filename: JSON file of the ledger, created if it does not exist.
+        :param _dailyLimit: number of requests allowed per day by the API.
+        '''
+        self.m_Filename = _filename
+        self.m_DailyLimit = _dailyLimit
+        self.m_Lock = threading.Lock()
+
+        self.m_Day = ''
+        self.m_Counts = {}
+        self.b_IsDirty = False #Counters changed since the last save
+        self.Load()
+
+    def Load(self):
+        if not os.path.exists(self.m_Filename):
+            return
+
+        try:
+            with open(self.m_Filename, 'r') as jsonLedger:
+                data = json.load(jsonLedger)
+            self.m_Day = data['day']
+            self.m_Counts = data['counts']
+        except (ValueError, KeyError) as e:
+            logging.warning("Invalid quota ledger {}, reset: {}".format(self.m_Filename, e))
+
+    def Save(self):
+        temporaryFilename = self.m_Filename + '.tmp'
+        with open(temporaryFilename, 'w') as jsonLedger:
+            json.dump({'day': self.m_Day, 'counts': self.m_Counts}, jsonLedger)
+        os.replace(temporaryFilename, self.m_Filename) #Never leave a truncated ledger
+
+    def Flush(self):
+        '''
+        Save the ledger if a request was counted since the last save.
+        :return: None
+        '''
+        with self.m_Lock:
+            if self.b_IsDirty:
+                self.Save()
+                self.b_IsDirty = False
+
+    def RollDay(self):
+        '''
+        Reset the counters when the day has changed.
+        :return: None
+        '''
+        currentDay = utility.GetCurrentDateTime().strftime('%Y-%m-%d')
+        if currentDay != self.m_Day:
+            self.m_Day = currentDay
+            self.m_Counts = {}
+            self.b_IsDirty = True
+
+    def Record(self, _endpoint: str):
+        '''
+        Count a request sent to the API.
+        :param _endpoint: name of the endpoint (K_ENDPOINT_LIVE, K_ENDPOINT_TIMETABLE, K_ENDPOINT_PLACES)
+        :return: None
+        '''
+        with self.m_Lock:
+            self.RollDay()
+            self.m_Counts[_endpoint] = self.m_Counts.get(_endpoint, 0) + 1
+            self.b_IsDirty = True
+
+    def GetCount(self, _endpoint: str):
+        with self.m_Lock:
+            self.RollDay()
+            return self.m_Counts.get(_endpoint, 0)
+
+    def GetUsed(self):
+        with self.m_Lock:
+            self.RollDay()
+            return sum(self.m_Counts.values())
+
+    def GetRemaining(self):
+        return max(0, self.m_DailyLimit - self.GetUsed())
+
+    def GetSummary(self):
+        '''
+        :return: readable summary of the requests of the day
+        '''
+        counts = ' | '.join("{} {}".format(endpoint, self.GetCount(endpoint)) for endpoint in K_ALL_ENDPOINTS)
+        return "{}/{} requests ({})".format(self.GetUsed(), self.m_DailyLimit, counts)
+
+
+class QuotaPlanner:
+    '''
+    Scale the refreshDepartures interval of the agenda so the remaining requests of the day
+    last until midnight. The same scale is applied to all the slots, so the peak windows keep
+    the largest share of the requests.
+    '''
+
+    def __init__(self, _ledger: QuotaLedger, _agenda: list, _configQuota: dict, _stationCount: int = 1):
+        '''
+        :param _stationCount: number of stations polled with the same agenda and sharing the ledger.
+        '''
+        self.m_Ledger = _ledger
+        self.m_Agenda = _agenda
+        self.m_StationCount = _stationCount
+        self.m_Reserve = _configQuota['reserve']
+        self.m_MinimumScale = _configQuota['minimumScale']
+        self.m_MaximumScale = _configQuota['maximumScale']
+        self.m_DefaultPollCost = _configQuota['defaultPollCost']
+
+    def GetPollCost(self):
+        '''
+        Average number of requests spent per live request (live and timetables).
+        The places requests are left out: they are cached for days and mostly spent at the first polls.
+        :return: the average measured today, or defaultPollCost before the first live request
+        '''
+        liveCount = self.m_Ledger.GetCount(K_ENDPOINT_LIVE)
+        if liveCount == 0:
+            return self.m_DefaultPollCost
+
+        return (liveCount + self.m_Ledger.GetCount(K_ENDPOINT_TIMETABLE)) / liveCount
+
+    def GetRemainingSlots(self, _currentDateTime: datetime):
+        '''
+        Split the rest of the day into the agenda slots.
+        :return: list of (duration in seconds, configured refreshDepartures), the first one being the current slot
+        '''
+        midnight = _currentDateTime.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+        allSlotStart = []
+        for timeCondition in self.m_Agenda:
+            hour, minute = [int(value) for value in timeCondition['startCondition'].split(':')]
+            allSlotStart.append(_currentDateTime.replace(hour=hour, minute=minute, second=0, microsecond=0))
+
+        slots = []
+        for index, timeCondition in enumerate(self.m_Agenda):
+            #The slot before the first start condition is the last one of the previous day
+            slotStart = allSlotStart[index]
+            slotEnd = allSlotStart[index + 1] if index + 1 < len(self.m_Agenda) else midnight
+
+            duration = (slotEnd - max(slotStart, _currentDateTime)).total_seconds()
+            if duration > 0:
+                slots.append((duration, timeCondition['refreshDepartures']))
+
+        if _currentDateTime < allSlotStart[0]:
+            duration = (allSlotStart[0] - _currentDateTime).total_seconds()
+            slots.insert(0, (duration, self.m_Agenda[-1]['refreshDepartures']))
+
+        return slots
+
+    def GetScale(self, _currentDateTime: datetime):
+        '''
+        Ratio between the requests planned by the agenda until midnight and the remaining budget.
+        :return: the scale to apply to refreshDepartures, clamped to [minimumScale, maximumScale]
+        '''
+        budget = self.m_Ledger.GetRemaining() - self.m_Reserve * self.m_Ledger.m_DailyLimit
+        if budget <= 0:
+            return self.m_MaximumScale
+
+        plannedPolls = sum(duration / refreshDepartures for duration, refreshDepartures in self.GetRemainingSlots(_currentDateTime))
+        plannedPolls *= self.m_StationCount
+        plannedCost = plannedPolls * self.GetPollCost()
+
+        return utility.Clamp(plannedCost / budget, self.m_MinimumScale, self.m_MaximumScale)
+
+    def GetRefreshDepartures(self, _refreshDepartures: float, _currentDateTime: datetime):
+        '''
+        :param _refreshDepartures: refreshDepartures of the current agenda slot.
+        :return: the refreshDepartures interval adapted to the remaining budget
+        '''
+        scale = self.GetScale(_currentDateTime)
+        logging.info("Quota {} | refreshDepartures x{:.2f}".format(self.m_Ledger.GetSummary(), scale))
+        return _refreshDepartures * scale
@@ -0,0 +1,74 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import heapq
+import itertools
+import time
+
+
+class Scheduler:
+    '''
+    Priority queue of named jobs, each job has its own deadline.
+    Scheduling a job again replaces its previous deadline.
+    '''
+    def __init__(self, _clock = time.monotonic):
+        '''
+        :param _clock: function returning the current time in seconds.
+        '''
+        self.m_Clock = _clock
+        self.m_Queue = []     #heap of (deadline, sequence, job name), can contain replaced deadlines
+        self.m_Deadlines = {} #job name -> current deadline
+        self.m_Sequence = itertools.count()
+
+    def Schedule(self, _job: str, _delay: float):
+        '''
+        Schedule a job, replacing its previous deadline.
+        :param _job: name of the job.
+        :param _delay: time in seconds until the job is due.
+        :return: None
+        '''
+        deadline = self.m_Clock() + max(0.0, _delay)
+        self.m_Deadlines[_job] = deadline
+        heapq.heappush(self.m_Queue, (deadline, next(self.m_Sequence), _job))
+
+    def Cancel(self, _job: str):
+        self.m_Deadlines.pop(_job, None)
+
+    def IsScheduled(self, _job: str):
+        return _job in self.m_Deadlines
+
+    def PopIfDue(self, _job: str):
+        '''
+        Remove the job from the queue if its deadline is reached.
+        :param _job: name of the job.
+        :return: True if the job is due
+        '''
+        deadline = self.m_Deadlines.get(_job)
+        if deadline == None or deadline > self.m_Clock():
+            return False
+
+        del self.m_Deadlines[_job]
+        return True
+
+    def GetNextDeadline(self):
+        '''
+        :return: (deadline, job name) of the earliest job, None if no job is scheduled
+        '''
+        while len(self.m_Queue) != 0:
+            deadline, _, job = self.m_Queue[0]
+            if self.m_Deadlines.get(job) == deadline:
+                return deadline, job
+
+            heapq.heappop(self.m_Queue) #Replaced or cancelled
+
+        return None
+
+    def GetNextDelay(self):
+        '''
+        :return: time in seconds until the earliest job, None if no job is scheduled
+        '''
+        nextDeadline = self.GetNextDeadline()
+        if nextDeadline == None:
+            return None
+
+        return max(0.0, nextDeadline[0] - self.m_Clock())
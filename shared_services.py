@@ -0,0 +1,62 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import tracing
+from places_cache import PlacesCache
+from quota import QuotaLedger, QuotaPlanner
+from station_graph import StationGraph
+from timetable_cache import TimetableCache
+from transport_replay import RecordingSession
+from transportrequest import CreateSession
+
+
+class SharedServices:
+    '''
+    Resources shared by all the station boards of a process: HTTP session, API quota,
+    places cache, timetable cache, station graph and the frames of the frame server.
+    '''
+    def __init__(self, _config: dict, _stationCount: int = 1):
+        '''
+        :param _config: configuration dictionary of config.json.
+        :param _stationCount: number of stations using these services.
+        '''
+        tracing.Configure(_config['tracing'])
+
+        self.m_Session = CreateSession(_config['transportRequest'])
+
+        configQuota = _config['quota']
+        self.m_QuotaLedger = QuotaLedger(configQuota['ledgerFilename'], configQuota['dailyLimit'])
+        self.m_QuotaPlanner = None
+        if configQuota['adaptive']:
+            self.m_QuotaPlanner = QuotaPlanner(self.m_QuotaLedger, _config['agenda'], configQuota, _stationCount)
+
+        configPlacesCache = _config['placesCache']
+        self.m_PlacesCache = PlacesCache(configPlacesCache['filename'], configPlacesCache['timeToLive'], configPlacesCache['negativeTimeToLive'])
+
+        self.m_TimetableCache = TimetableCache(_config['timetableCache']['timeToLive'])
+        self.m_StationGraph = StationGraph()
+
+        #Frames served to the e-ink clients in frame server mode
+        self.m_FrameCache = None
+        configFrameServer = _config['frameServer']
+        if configFrameServer['enabled']:
+            from frame_server import FrameCache #http.server is only imported in frame server mode
+            self.m_FrameCache = FrameCache(configFrameServer['history'], (configFrameServer['epdWidth'], configFrameServer['epdHeight']))
+
+    def Flush(self):
+        '''
+        Save the state changed during the update cycle, the API quota ledger and the recorded responses.
+        :return: None
+        '''
+        self.m_QuotaLedger.Flush()
+        if isinstance(self.m_Session, RecordingSession):
+            self.m_Session.Flush()
+
+    def Close(self):
+        '''
+        Save the state and end the recording.
+        :return: None
+        '''
+        self.Flush()
+        if isinstance(self.m_Session, RecordingSession):
+            self.m_Session.Close()
@@ -0,0 +1,52 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import logging
+import os
+import pickle
+
+K_ARTIFACT_VERSION = 1
+
+def GetSignature(_sourceFilenames: list):
+    '''
+    :return: list of (filename, modification time, size) of the source files
+    '''
+    signature = []
+    for filename in _sourceFilenames:
+        status = os.stat(filename)
+        signature.append((os.path.abspath(filename), status.st_mtime_ns, status.st_size))
+    return signature
+
+def LoadArtifact(_artifactFilename: str, _sourceFilenames: list, _build):
+    '''
+    Load a value precomputed from source files, to skip the parsing at startup.
+    The artifact is rebuilt and saved again when a source file has changed.
+    :param _artifactFilename: pickle file of the artifact.
+    :param _sourceFilenames: files the value is computed from, including the module computing it.
+    :param _build: function computing the value from the source files.
+    :return: the value, loaded or built
+    '''
+    signature = GetSignature(_sourceFilenames)
+
+    try:
+        with open(_artifactFilename, 'rb') as artifactFile:
+            artifact = pickle.load(artifactFile)
+        if artifact['version'] == K_ARTIFACT_VERSION and artifact['signature'] == signature:
+            return artifact['value']
+        logging.info("Artifact {} outdated, rebuilt".format(_artifactFilename))
+    except FileNotFoundError:
+        logging.info("Artifact {} not found, built".format(_artifactFilename))
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, KeyError, TypeError) as e:
+        logging.warning("Invalid artifact {}, rebuilt: {}".format(_artifactFilename, e))
+
+    value = _build()
+
+    try:
+        temporaryFilename = _artifactFilename + '.tmp'
+        with open(temporaryFilename, 'wb') as artifactFile:
+            pickle.dump({'version': K_ARTIFACT_VERSION, 'signature': signature, 'value': value}, artifactFile, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporaryFilename, _artifactFilename) #Never leave a truncated artifact
+    except OSError as e:
+        logging.warning("Artifact {} not saved: {}".format(_artifactFilename, e))
+
+    return value
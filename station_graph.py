@@ -0,0 +1,73 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+
+class NodeStation:
+    def __init__(self, _ID: str, _coordinate = (0,0)):
+        self.m_ID = _ID
+        self.m_Coordinate = _coordinate #(latitude, longitude), projected on each station map when drawn
+
+
+class StationGraph:
+    '''
+    Network of the stations, indexed by station code.
+    Two lines converging on the same station share the same node.
+    The nodes are geographic, so a graph can be shared by several station boards.
+    '''
+    def __init__(self):
+        self.m_Nodes = []
+        self.m_Index = {}     #station code -> NodeStation
+        self.m_Adjacency = {} #station ID -> set of the connected station ID
+        self.m_Revision = 0   #Incremented each time a node or a connection is added
+
+    def AddNode(self, _node: NodeStation, _alias: str = None):
+        '''
+        Add a node to the network.
+        :param _node: NodeStation to add.
+        :param _alias: Other station code of the node, if the code of the stop differs from the place result.
+        :return: the NodeStation of the network, the existing one if a node with the same ID was already added
+        '''
+        node = self.m_Index.get(_node.m_ID)
+        if node == None:
+            node = _node
+            self.m_Nodes.append(node)
+            self.m_Index[node.m_ID] = node
+            self.m_Adjacency[node.m_ID] = set()
+            self.m_Revision += 1
+
+        if _alias != None:
+            self.m_Index.setdefault(_alias, node)
+
+        return node
+
+    def AddEdge(self, _lhsNode: NodeStation, _rhsNode: NodeStation):
+        '''
+        Connect two nodes of the network.
+        :return: True if the connection is new
+        '''
+        if _lhsNode.m_ID == _rhsNode.m_ID or _rhsNode.m_ID in self.m_Adjacency[_lhsNode.m_ID]:
+            return False
+
+        self.m_Adjacency[_lhsNode.m_ID].add(_rhsNode.m_ID)
+        self.m_Adjacency[_rhsNode.m_ID].add(_lhsNode.m_ID)
+        self.m_Revision += 1
+        return True
+
+    def Search(self, _ID: str):
+        '''
+        Search the corresponding station code
+        :param _ID: station code ID to search
+        :return: the corresponding NodeStation if found or None
+        '''
+        return self.m_Index.get(_ID)
+
+    def GetEdges(self):
+        '''
+        :return: list of (NodeStation, NodeStation), each connection only once
+        '''
+        edges = []
+        for lhsID, allRhsID in self.m_Adjacency.items():
+            for rhsID in allRhsID:
+                if lhsID < rhsID:
+                    edges.append((self.m_Index[lhsID], self.m_Index[rhsID]))
+        return edges
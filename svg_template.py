@@ -0,0 +1,75 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import codecs
+import logging
+import re
+
+import utility
+
+#A placeholder is the whole text of an element, in capital letters: >DEPARTURE_00<
+K_PLACEHOLDER_PATTERN = re.compile(r'>(\s*)([A-Z][A-Z0-9]*(?:_[A-Z0-9]+)+)(\s*)<')
+
+#Characters to escape in a text node
+K_XML_ESCAPE_TABLE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+
+def EscapeText(_value: str):
+    '''
+    :return: _value escaped to be written in a XML text node
+    '''
+    return _value.translate(K_XML_ESCAPE_TABLE)
+
+
+class SvgTemplate:
+    '''
+    SVG template compiled once into static segments and placeholder slots.
+    A render writes the segments and the escaped values in a single pass.
+    '''
+    def __init__(self, _templateSvgFilename: str):
+        '''
+        :param _templateSvgFilename: Reference template, the placeholders are the texts in capital letters (HEADER_DEPARTURE, DEPARTURE_00, ...).
+        '''
+        utility.AssertOnFile(_templateSvgFilename)
+
+        with codecs.open(_templateSvgFilename, 'r', encoding='UTF-8') as svgFile:
+            self.Compile(svgFile.read())
+
+    def Compile(self, _svgContent: str):
+        self.m_Segments = [] #Static text, one more segment than slots
+        self.m_Slots = []    #Placeholder of each slot, in the order of the file
+
+        position = 0
+        for match in K_PLACEHOLDER_PATTERN.finditer(_svgContent):
+            self.m_Segments.append(_svgContent[position:match.start(2)])
+            self.m_Slots.append(match.group(2))
+            position = match.end(2)
+        self.m_Segments.append(_svgContent[position:])
+
+        logging.debug("SVG template compiled: {} slots".format(len(self.m_Slots)))
+
+    def GetPlaceholders(self):
+        '''
+        :return: set of the placeholders of the template
+        '''
+        return set(self.m_Slots)
+
+    def Render(self, _inputDict: dict):
+        '''
+        Replace the placeholders with the values of _inputDict, a placeholder without value is left empty.
+        :param _inputDict: placeholder as key, text as value
+        :return: the SVG content
+        '''
+        parts = [None] * (2 * len(self.m_Slots) + 1)
+        parts[0::2] = self.m_Segments
+        parts[1::2] = [EscapeText(_inputDict.get(placeholder, '')) for placeholder in self.m_Slots]
+        return ''.join(parts)
+
+    def Write(self, _outputSvgFilename: str, _inputDict: dict):
+        '''
+        Render the template in a file.
+        :return: None
+        '''
+        logging.info("Update %s", _outputSvgFilename)
+
+        with codecs.open(_outputSvgFilename, 'w', encoding='UTF-8') as svgFile:
+            svgFile.write(self.Render(_inputDict))
@@ -0,0 +1,239 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import logging
+import re
+
+from PIL import Image, ImageDraw, ImageFont
+
+import startup_artifact
+import utility
+
+K_SVG_NAMESPACE = '{http://www.w3.org/2000/svg}'
+K_DEFAULT_LINE_HEIGHT = 1.25
+K_FALLBACK_FONT = 'asset/IBMPlexSans-ExtraLight.ttf'
+K_TEXT_ANCHOR = hasattr(ImageFont.FreeTypeFont, 'getbbox') #Text anchors need Pillow 8.0, Raspbian Buster ships Pillow 5.4
+
+def ParseStyle(_style: str):
+    '''
+    Convert a SVG style attribute into a dictionary.
+    :param _style: style attribute ('key:value;key:value')
+    :return: dictionary of the style properties
+    '''
+    style = {}
+    for declaration in _style.split(';'):
+        if ':' in declaration:
+            key, value = declaration.split(':', 1)
+            style[key.strip()] = value.strip()
+    return style
+
+def ParseLength(_value: str, _default: float = 0.0):
+    '''
+    Convert a SVG length ('15px', '15') into a float.
+    :return: the length in pixel or _default if _value is None
+    '''
+    if _value == None:
+        return _default
+    return float(re.sub(r'[a-z%]+$', '', _value.strip()))
+
+def ParseTranslate(_transform: str):
+    '''
+    Get the offset of a 'translate(x,y)' transform.
+    :param _transform: transform attribute, can be None
+    :return: (x, y) offset, (0, 0) if there is no translation
+    '''
+    if _transform == None:
+        return (0.0, 0.0)
+
+    match = re.search(r'translate\(\s*([-\d.eE]+)(?:[\s,]+([-\d.eE]+))?\s*\)', _transform)
+    if match == None:
+        return (0.0, 0.0)
+
+    return (float(match.group(1)), float(match.group(2) or 0.0))
+
+def ParsePath(_pathData: str):
+    '''
+    Convert a SVG path made of straight lines (M, L, H, V commands) into a list of polylines.
+    :param _pathData: 'd' attribute of the path
+    :return: list of polylines, a polyline being a list of (x, y) points
+    '''
+    polylines = []
+    position = (0.0, 0.0)
+    command = 'M'
+    tokens = re.findall(r'[MmLlHhVvZz]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?', _pathData)
+
+    index = 0
+    while index < len(tokens):
+        if tokens[index].isalpha():
+            command = tokens[index]
+            index += 1
+            if command in 'Zz':
+                if polylines and len(polylines[-1]) > 1:
+                    polylines[-1].append(polylines[-1][0])
+                continue
+
+        isRelative = command.islower()
+        if command in 'MmLl':
+            x, y = float(tokens[index]), float(tokens[index + 1])
+            index += 2
+            position = (position[0] + x, position[1] + y) if isRelative else (x, y)
+            if command in 'Mm':
+                polylines.append([position])
+                command = 'l' if isRelative else 'L' #Next coordinates are implicit line-to
+            else:
+                polylines[-1].append(position)
+        elif command in 'HhVv':
+            value = float(tokens[index])
+            index += 1
+            if command in 'Hh':
+                position = (position[0] + value if isRelative else value, position[1])
+            else:
+                position = (position[0], position[1] + value if isRelative else value)
+            polylines[-1].append(position)
+        else:
+            logging.warning("Unsupported path command %s", command)
+            break
+
+    return polylines
+
+
+class TextField:
+    '''Text anchor of the template: baseline position, box and font size'''
+    def __init__(self, _placeholder: str, _position, _box, _fontSize: float, _lineHeight: float):
+        self.m_Placeholder = _placeholder
+        self.m_Position = _position
+        self.m_Box = _box
+        self.m_FontSize = _fontSize
+        self.m_LineHeight = _lineHeight
+
+
+class TemplateRenderer:
+    '''Render the text fields of an SVG template directly with Pillow, without Inkscape'''
+
+    def __init__(self, _templateSvgFilename: str, _fontFilename: str, _compiledFilename: str = None):
+        '''
+        Parse the template once, the text anchors, boxes and font sizes are kept for all the renders.
+        :param _templateSvgFilename: Reference template.
+        :param _fontFilename: TrueType font used to draw the texts.
+        :param _compiledFilename: artifact of the parsed template, reused at the next startup while the template is unchanged. None to always parse it.
+        '''
+        utility.AssertOnFile(_templateSvgFilename)
+
+        self.m_Size = (0, 0)
+        self.m_Fields = {}
+        self.m_Lines = [] #list of (polyline, width)
+
+        if _compiledFilename != None:
+            compiledTemplate = startup_artifact.LoadArtifact(_compiledFilename, [_templateSvgFilename, __file__],
+                                                             lambda: self.ParseTemplate(_templateSvgFilename))
+            self.m_Size, self.m_Fields, self.m_Lines = compiledTemplate
+        else:
+            self.ParseTemplate(_templateSvgFilename)
+
+        self.m_FontFilename = _fontFilename
+        self.m_Fonts = {}
+
+    def ParseTemplate(self, _templateSvgFilename: str):
+        '''
+        Parse the text fields and the lines of the template.
+        :return: (size, fields, lines) of the template
+        '''
+        import xml.etree.ElementTree as ElementTree #Not needed when the compiled template is loaded
+
+        root = ElementTree.parse(_templateSvgFilename).getroot()
+        self.m_Size = (int(ParseLength(root.get('width'))), int(ParseLength(root.get('height'))))
+
+        boxes = {}
+        for rect in root.iter(K_SVG_NAMESPACE + 'rect'):
+            if rect.get('id') != None:
+                boxes[rect.get('id')] = (ParseLength(rect.get('x')), ParseLength(rect.get('y')),
+                                         ParseLength(rect.get('width')), ParseLength(rect.get('height')))
+
+        for text in root.iter(K_SVG_NAMESPACE + 'text'):
+            tspan = text.find(K_SVG_NAMESPACE + 'tspan')
+            if tspan == None or tspan.text == None:
+                continue
+
+            style = ParseStyle(text.get('style', ''))
+            fontSize = ParseLength(style.get('font-size'), 16.0)
+            lineHeight = float(style.get('line-height', K_DEFAULT_LINE_HEIGHT)) * fontSize
+            offset = ParseTranslate(text.get('transform'))
+
+            position = (ParseLength(tspan.get('x')) + offset[0], ParseLength(tspan.get('y')) + offset[1])
+
+            box = None
+            shapeInside = re.match(r'url\(#(.+)\)', style.get('shape-inside', ''))
+            if shapeInside != None and shapeInside.group(1) in boxes:
+                x, y, width, height = boxes[shapeInside.group(1)]
+                box = (x + offset[0], y + offset[1], width, height)
+
+            placeholder = tspan.text.strip()
+            self.m_Fields[placeholder] = TextField(placeholder, position, box, fontSize, lineHeight)
+
+        for path in root.iter(K_SVG_NAMESPACE + 'path'):
+            style = ParseStyle(path.get('style', ''))
+            if style.get('stroke', 'none') == 'none':
+                continue
+
+            width = max(1, int(round(ParseLength(style.get('stroke-width'), 1.0))))
+            for polyline in ParsePath(path.get('d', '')):
+                self.m_Lines.append((polyline, width))
+
+        logging.debug("Template parsed: {} text fields, {} lines".format(len(self.m_Fields), len(self.m_Lines)))
+        return self.m_Size, self.m_Fields, self.m_Lines
+
+    def GetFont(self, _fontSize: float):
+        '''
+        Get the font at the given size, loaded only once.
+        :param _fontSize: size in pixel
+        :return: ImageFont
+        '''
+        font = self.m_Fonts.get(_fontSize)
+        if font == None:
+            try:
+                font = ImageFont.truetype(self.m_FontFilename, int(round(_fontSize)))
+            except OSError:
+                logging.warning("Font {} not found, {} used instead".format(self.m_FontFilename, K_FALLBACK_FONT))
+                self.m_FontFilename = K_FALLBACK_FONT
+                font = ImageFont.truetype(self.m_FontFilename, int(round(_fontSize)))
+            self.m_Fonts[_fontSize] = font
+        return font
+
+    def GetFieldWidth(self, _placeholder: str):
+        '''
+        :return: width in pixel available from the text position to the end of its box, or to the right of the template without box
+        '''
+        field = self.m_Fields[_placeholder]
+        if field.m_Box == None:
+            return self.m_Size[0] - field.m_Position[0]
+        return field.m_Box[0] + field.m_Box[2] - field.m_Position[0]
+
+    def Render(self, _inputDict: dict):
+        '''
+        Draw the template with the values of _inputDict in place of the placeholders.
+        :param _inputDict: placeholder as key, text to draw as value
+        :return: grayscale Image of the template size
+        '''
+        image = Image.new('L', self.m_Size, 255)
+        draw = ImageDraw.Draw(image)
+
+        for polyline, width in self.m_Lines:
+            draw.line(polyline, fill=0, width=width)
+
+        for placeholder, value in _inputDict.items():
+            field = self.m_Fields.get(placeholder)
+            if field == None:
+                logging.debug("No text field for {}".format(placeholder))
+                continue
+
+            font = self.GetFont(field.m_FontSize)
+            x, y = field.m_Position
+            for line in value.split('\n'):
+                if K_TEXT_ANCHOR:
+                    draw.text((x, y), line, fill=0, font=font, anchor='ls')
+                else:
+                    #Without anchor the text is drawn from its ascender line, one ascent above the baseline
+                    draw.text((x, y - font.getmetrics()[0]), line, fill=0, font=font)
+                y += field.m_LineHeight
+
+        return image
@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import threading
+import time
+
+
+class TimetableCache:
+    '''
+    In-memory cache of the timetable requests, keyed by (service ID, train UID), or by
+    (service ID, station code, aimed time) when the API doesn't provide the train UID.
+    The service ID is shared by all the trains of a route, so a timetable is only reused for the same train,
+    by all the configured stations it calls at.
+    A train is requested only once, even by concurrent callers.
+    '''
+
+    def __init__(self, _timeToLive: float):
+        '''
+        :param _timeToLive: validity in seconds of a timetable.
+        '''
+        self.m_TimeToLive = _timeToLive
+
+        self.m_Lock = threading.Lock()
+        self.m_Timetables = {} #key -> (raw stops list, timestamp)
+        self.m_Pending = {}    #key -> threading.Event set when the request of another caller is done
+
+    def Get(self, _key: tuple):
+        '''
+        :return: the raw stops list of the train, or None if not cached or expired
+        '''
+        with self.m_Lock:
+            return self.GetUnlocked(_key)
+
+    def GetUnlocked(self, _key: tuple):
+        entry = self.m_Timetables.get(_key)
+        if entry == None:
+            return None
+
+        timetable, timestamp = entry
+        if time.time() - timestamp > self.m_TimeToLive:
+            del self.m_Timetables[_key]
+            return None
+
+        return timetable
+
+    def GetTimetables(self, _keys: list, _request):
+        '''
+        Get the timetables of several trains, requesting only the ones not cached nor already requested.
+        :param _keys: list of timetable keys, see DepartureManager.GetTimetableKey.
+        :param _request: function requesting a list of keys and returning the list of raw stops list in the same order.
+        :return: list of raw stops list, in the same order as _keys. An empty list for a failed request, which is not cached
+        '''
+        requestedKeys = []
+        allPendingEvent = []
+        with self.m_Lock:
+            for key in _keys:
+                if key in requestedKeys or self.GetUnlocked(key) != None:
+                    continue
+
+                pendingEvent = self.m_Pending.get(key)
+                if pendingEvent != None:
+                    allPendingEvent.append(pendingEvent)
+                    continue
+
+                self.m_Pending[key] = threading.Event()
+                requestedKeys.append(key)
+
+        results = {}
+        try:
+            if len(requestedKeys) != 0:
+                results = dict(zip(requestedKeys, _request(requestedKeys)))
+        finally:
+            with self.m_Lock:
+                currentTime = time.time()
+                for key in requestedKeys:
+                    timetable = results.get(key)
+                    if timetable:
+                        self.m_Timetables[key] = (timetable, currentTime)
+                    self.m_Pending.pop(key).set()
+
+        for pendingEvent in allPendingEvent:
+            pendingEvent.wait()
+
+        allTimetables = []
+        for key in _keys:
+            timetable = results.get(key)
+            if timetable == None:
+                timetable = self.Get(key) or []
+            allTimetables.append(timetable)
+
+        return allTimetables
+
+    def Purge(self):
+        '''
+        Remove the expired timetables.
+        :return: number of timetables removed
+        '''
+        with self.m_Lock:
+            currentTime = time.time()
+            expiredKeys = [key for key, (_, timestamp) in self.m_Timetables.items() if currentTime - timestamp > self.m_TimeToLive]
+            for key in expiredKeys:
+                del self.m_Timetables[key]
+            return len(expiredKeys)
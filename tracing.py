@@ -0,0 +1,175 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import json
+import logging
+import signal
+import threading
+import time
+
+
+class NullTraceSpan:
+    '''Span used when the tracing is disabled, does nothing'''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _type, _value, _traceback):
+        return False
+
+
+K_NULL_SPAN = NullTraceSpan()
+
+
+class TraceSpan:
+    '''Measure the wall and CPU time of a block and write it as a JSON line'''
+    def __init__(self, _tracer, _name: str, _attributes: dict):
+        self.m_Tracer = _tracer
+        self.m_Name = _name
+        self.m_Attributes = _attributes
+
+    def __enter__(self):
+        self.m_StartTime = time.time()
+        self.m_StartCounter = time.perf_counter()
+        self.m_StartCpu = time.thread_time()
+        return self
+
+    def __exit__(self, _type, _value, _traceback):
+        record = {'name': self.m_Name,
+                  'start': round(self.m_StartTime, 6),
+                  'wall_ms': round((time.perf_counter() - self.m_StartCounter) * 1000.0, 3),
+                  'cpu_ms': round((time.thread_time() - self.m_StartCpu) * 1000.0, 3),
+                  'thread': threading.current_thread().name}
+        if _type != None:
+            record['error'] = _type.__name__
+        record.update(self.m_Attributes)
+
+        self.m_Tracer.Write(record)
+        return False
+
+
+class Tracer:
+    '''
+    Write the timing of the update stages and of the requests as JSON lines,
+    and profile the next update cycles on demand (config or SIGUSR1).
+    '''
+    def __init__(self):
+        self.b_Enabled = False
+        self.m_File = None
+        self.m_Lock = threading.Lock()
+
+        self.m_ProfileFilename = 'profile.prof'
+        self.m_ProfileCyclesRequested = 0
+        self.m_ProfileCyclesOnSignal = 0
+        self.m_Profile = None
+        self.m_ProfileCycles = 0
+
+    def Configure(self, _configTracing: dict):
+        '''
+        :param _configTracing: 'tracing' part of config.json
+        :return: None
+        '''
+        with self.m_Lock:
+            if self.m_File != None:
+                self.m_File.close()
+                self.m_File = None
+
+            self.b_Enabled = _configTracing['enabled']
+            if self.b_Enabled:
+                self.m_File = open(_configTracing['filename'], 'a')
+
+        self.m_ProfileFilename = _configTracing['profileFilename']
+        self.m_ProfileCyclesOnSignal = max(1, _configTracing['profileCycles'])
+        self.RequestProfile(_configTracing['profileCycles'])
+
+        #kill -USR1 <pid> profiles the next cycles, the handler can only be installed from the main thread
+        if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, lambda _signum, _frame: self.RequestProfile(self.m_ProfileCyclesOnSignal))
+
+    def Span(self, _name: str, **_attributes):
+        '''
+        :param _name: name of the measured block.
+        :param _attributes: additional values written in the record.
+        :return: a context manager measuring the block, doing nothing if the tracing is disabled
+        '''
+        if not self.b_Enabled:
+            return K_NULL_SPAN
+        return TraceSpan(self, _name, _attributes)
+
+    def Write(self, _record: dict):
+        line = json.dumps(_record, separators=(',', ':')) + '\n'
+        with self.m_Lock:
+            if self.m_File != None:
+                self.m_File.write(line)
+
+    def Flush(self):
+        with self.m_Lock:
+            if self.m_File != None:
+                self.m_File.flush()
+
+    def RequestProfile(self, _cycles: int):
+        '''
+        Profile the next update cycles with cProfile.
+        :param _cycles: number of cycles to profile, the profile is written in profileFilename afterwards
+        :return: None
+        '''
+        self.m_ProfileCyclesRequested = _cycles
+
+    def BeginCycle(self):
+        if self.m_Profile == None and self.m_ProfileCyclesRequested > 0:
+            logging.info("Profile the next {} cycles".format(self.m_ProfileCyclesRequested))
+            import cProfile #Only needed when profiling
+            self.m_Profile = cProfile.Profile()
+            self.m_ProfileCycles = self.m_ProfileCyclesRequested
+            self.m_ProfileCyclesRequested = 0
+
+        if self.m_Profile != None:
+            self.m_Profile.enable()
+
+    def EndCycle(self):
+        self.Flush()
+
+        if self.m_Profile == None:
+            return
+
+        self.m_Profile.disable()
+        self.m_ProfileCycles -= 1
+        if self.m_ProfileCycles <= 0:
+            self.m_Profile.dump_stats(self.m_ProfileFilename)
+            logging.info("Profile written in {}".format(self.m_ProfileFilename))
+            self.m_Profile = None
+
+    def Cycle(self):
+        '''
+        :return: a context manager around one update cycle, measured and profiled if requested
+        '''
+        return TraceCycle(self)
+
+
+class TraceCycle:
+    def __init__(self, _tracer: Tracer):
+        self.m_Tracer = _tracer
+        self.m_Span = None
+
+    def __enter__(self):
+        self.m_Tracer.BeginCycle()
+        self.m_Span = self.m_Tracer.Span('Update')
+        self.m_Span.__enter__()
+        return self
+
+    def __exit__(self, _type, _value, _traceback):
+        self.m_Span.__exit__(_type, _value, _traceback)
+        self.m_Tracer.EndCycle()
+        return False
+
+
+#Shared by all the modules, like the logging module
+tracer = Tracer()
+
+def Configure(_configTracing: dict):
+    tracer.Configure(_configTracing)
+
+def Span(_name: str, **_attributes):
+    return tracer.Span(_name, **_attributes)
+
+def Cycle():
+    return tracer.Cycle()
@@ -0,0 +1,179 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import gzip
+import json
+import logging
+import threading
+import time
+
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+import utility
+
+K_MODE_LIVE = 'live'
+K_MODE_RECORD = 'record'
+K_MODE_REPLAY = 'replay'
+
+K_PRIVATE_PARAMETERS = ('app_id', 'app_key')
+
+def GetRequestKey(_url: str, _params: dict):
+    '''
+    Identify a request independently of the credentials.
+    :param _url: URL of the request.
+    :param _params: query parameters of the request.
+    :return: path and sorted query parameters, without the credentials
+    '''
+    publicParams = sorted((key, value) for key, value in _params.items() if key not in K_PRIVATE_PARAMETERS)
+    return "{}?{}".format(urlsplit(_url).path, urlencode(publicParams))
+
+
+class Corpus:
+    '''
+    Recorded transport API responses, stored as gzip JSON lines.
+    Each record keeps the request key, the recording time and the JSON body.
+    A recording session writes a single gzip member, flushed at the end of each update cycle and closed with Close.
+    '''
+    def __init__(self, _filename: str):
+        self.m_Filename = _filename
+        self.m_Lock = threading.Lock()
+        self.m_File = None #Opened on the first record
+
+    def Append(self, _key: str, _body: dict):
+        record = {'key': _key,
+                  'recorded_at': utility.GetCurrentDateTime().isoformat(),
+                  'body': _body}
+
+        with self.m_Lock:
+            if self.m_File == None:
+                #A gzip file can be appended with a new member, readers decompress all the members
+                self.m_File = gzip.open(self.m_Filename, 'at', encoding='UTF-8')
+            self.m_File.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def Flush(self):
+        '''
+        Make the records written so far readable, without ending the gzip member.
+        :return: None
+        '''
+        with self.m_Lock:
+            if self.m_File != None:
+                self.m_File.flush()
+
+    def Close(self):
+        with self.m_Lock:
+            if self.m_File != None:
+                self.m_File.close()
+                self.m_File = None
+
+    def Load(self):
+        '''
+        :return: list of the records, in the recording order
+        '''
+        utility.AssertOnFile(self.m_Filename)
+
+        allRecord = []
+        with gzip.open(self.m_Filename, 'rt', encoding='UTF-8') as corpusFile:
+            try:
+                for line in corpusFile:
+                    if line.strip():
+                        allRecord.append(json.loads(line))
+            except EOFError: #Recording not closed, the records flushed before are kept
+                logging.warning("Corpus {} not closed, {} records loaded".format(self.m_Filename, len(allRecord)))
+        return allRecord
+
+
+class ReplayResponse:
+    '''Minimal requests.Response used by TransportRequest.DefaultRequest'''
+    def __init__(self, _body):
+        self.m_Body = _body
+        self.ok = _body != None
+        self.status_code = 200 if self.ok else 404
+
+    def json(self):
+        return self.m_Body
+
+
+class RecordingSession:
+    '''Forward the requests to a real session and record the valid responses in a corpus'''
+    def __init__(self, _session, _corpus: Corpus):
+        self.m_Session = _session
+        self.m_Corpus = _corpus
+
+    def get(self, _url, params = None, **kwargs):
+        response = self.m_Session.get(_url, params=params, **kwargs)
+        if response.ok:
+            self.m_Corpus.Append(GetRequestKey(_url, params or {}), response.json())
+        return response
+
+    def Flush(self):
+        self.m_Corpus.Flush()
+
+    def Close(self):
+        self.m_Corpus.Close()
+
+
+class ReplaySession:
+    '''
+    Serve the recorded responses instead of the transport API.
+    The responses of a same request are served in the recording order, the last one is then repeated.
+    '''
+    def __init__(self, _corpus: Corpus, _latency: float = 0.0):
+        '''
+        :param _corpus: recorded responses.
+        :param _latency: time in seconds added to each request, to simulate the network.
+        '''
+        self.m_Latency = _latency
+        self.m_Lock = threading.Lock()
+
+        self.m_Responses = {} #request key -> list of body
+        self.m_Served = {}    #request key -> number of responses served
+        self.m_RecordedAt = None
+
+        for record in _corpus.Load():
+            self.m_Responses.setdefault(record['key'], []).append(record['body'])
+            if self.m_RecordedAt == None:
+                self.m_RecordedAt = datetime.fromisoformat(record['recorded_at'])
+
+        logging.info("Replay {} requests from {}".format(len(self.m_Responses), _corpus.m_Filename))
+
+    def get(self, _url, params = None, **kwargs):
+        if self.m_Latency > 0:
+            time.sleep(self.m_Latency)
+
+        key = GetRequestKey(_url, params or {})
+        with self.m_Lock:
+            allBody = self.m_Responses.get(key)
+            if allBody == None:
+                logging.warning("No recorded response for {}".format(key))
+                return ReplayResponse(None)
+
+            index = self.m_Served.get(key, 0)
+            self.m_Served[key] = index + 1
+
+        return ReplayResponse(allBody[min(index, len(allBody) - 1)])
+
+
+def CreateSession(_session, _configAPI: dict):
+    '''
+    Wrap a requests session depending on the transportRequest mode of config.json.
+    In replay mode with replayClock, the current datetime is shifted to the recording time.
+    :param _session: requests.Session used in live and record modes.
+    :return: the session to use for the requests
+    '''
+    mode = _configAPI['mode']
+    if mode == K_MODE_LIVE:
+        return _session
+
+    corpus = Corpus(_configAPI['corpusFilename'])
+    if mode == K_MODE_RECORD:
+        logging.info("Record the transport API responses in {}".format(corpus.m_Filename))
+        return RecordingSession(_session, corpus)
+
+    assert mode == K_MODE_REPLAY, "Unknown transportRequest mode '{}', should be 'live', 'record' or 'replay'".format(mode)
+    replaySession = ReplaySession(corpus, _configAPI['replayLatency'])
+
+    if _configAPI['replayClock'] and replaySession.m_RecordedAt != None:
+        utility.SetCurrentDateTime(replaySession.m_RecordedAt)
+
+    return replaySession
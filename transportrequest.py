@@ -2,31 +2,78 @@
 # -*- coding:utf-8 -*-
 
 import json
-import requests
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+import transport_replay
+from quota import K_ENDPOINT_LIVE, K_ENDPOINT_PLACES, K_ENDPOINT_TIMETABLE
+
+def CreateSession(_configAPI):
+    '''
+    Keep-alive session, reuse the TLS connections between the requests.
+    The responses are recorded or replayed depending on transportRequest.mode.
+    :param _configAPI: 'transportRequest' part of config.json
+    :return: the session, can be shared by several TransportRequest
+    '''
+    session = None
+    if _configAPI['mode'] != transport_replay.K_MODE_REPLAY: #requests is the slowest module to import, not needed to replay
+        import requests
+
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(1, _configAPI['maxConcurrentRequests']))
+        session.mount('https://', adapter)
+
+    return transport_replay.CreateSession(session, _configAPI)
+
+def GetConnectionErrors():
+    '''
+    :return: tuple of the connection exceptions of requests, empty if requests has not been imported
+    '''
+    requestsModule = sys.modules.get('requests')
+    if requestsModule == None:
+        return ()
+    return (requestsModule.ConnectionError,)
+
 
 class TransportRequest:
 
-    def __init__(self, _configAPI):
+    def __init__(self, _configAPI, _quotaLedger = None, _session = None):
+        '''
+        :param _configAPI: 'transportRequest' part of config.json
+        :param _quotaLedger: QuotaLedger counting the requests, None to not count them.
+        :param _session: session shared with other stations, a new one is created if None.
+        '''
         self.m_AppID = _configAPI['appID']
         self.m_AppKey = _configAPI['key']
         self.m_StationCode = _configAPI['station_code']
         self.m_CallingAt = _configAPI['calling_at']
+        self.m_MaxConcurrentRequests = max(1, _configAPI['maxConcurrentRequests'])
+
+        self.m_Session = _session if _session != None else CreateSession(_configAPI)
 
+        #Replayed requests don't consume the API quota
+        self.m_QuotaLedger = _quotaLedger if _configAPI['mode'] != transport_replay.K_MODE_REPLAY else None
 
-    def DefaultRequest(self, _url, _customParams):
+    def DefaultRequest(self, _url, _customParams, _endpoint: str):
         queryParameters = {'app_id': self.m_AppID,
                   'app_key': self.m_AppKey}
 
         queryParameters.update(_customParams)
         try:
-            responseObject = requests.get(_url, queryParameters)
+            with tracing.Span('request', endpoint=_endpoint):
+                responseObject = self.m_Session.get(_url, params=queryParameters)
+            if self.m_QuotaLedger != None:
+                self.m_QuotaLedger.Record(_endpoint)
+
             if(responseObject.ok == False):
                 print("")
                 return
 
             return responseObject.json()
 
-        except requests.ConnectionError:
+        except GetConnectionErrors():
             return
 
 
@@ -36,7 +83,7 @@ class TransportRequest:
         customQueryParameters = { 'calling_at': self.m_CallingAt,
                     'darwin': 'true' }
 
-        dataTransport = self.DefaultRequest(url, customQueryParameters)
+        dataTransport = self.DefaultRequest(url, customQueryParameters, K_ENDPOINT_LIVE)
         if(dataTransport == None):
             return [], ""
 
@@ -48,20 +95,33 @@ class TransportRequest:
         url = f"https://transportapi.com/v3/uk/train/service/{_serviceID}///timetable.json"
         customQueryParameters = { 'station_code': self.m_StationCode }
 
-        dataTransport = self.DefaultRequest(url, customQueryParameters)
+        dataTransport = self.DefaultRequest(url, customQueryParameters, K_ENDPOINT_TIMETABLE)
         if(dataTransport == None):
             return []
 
         return dataTransport['stops']
 
+    def GetTimetablesAtServiceIDs(self, _serviceIDs: list):
+        '''
+        Timetabled service updates for several services, requested concurrently.
+        :param _serviceIDs: list of service ID to request.
+        :return: list of raw stops list, in the same order as _serviceIDs
+        '''
+        workerCount = min(self.m_MaxConcurrentRequests, len(_serviceIDs))
+        if workerCount <= 1:
+            return [self.GetTimetabledAtServiceID(serviceID) for serviceID in _serviceIDs]
+
+        with ThreadPoolExecutor(max_workers=workerCount) as executor:
+            return list(executor.map(self.GetTimetabledAtServiceID, _serviceIDs))
+
     def GetPlacesInformations(self, _query: str, _type: str):
-        ''' Various information from a location (geo location, code, name, type) '''
+        ''' Various information from a location (geo location, code, name, type). None if the request failed '''
         url = f"https://transportapi.com/v3/uk/places.json"
         customQueryParameters = {'query': _query,
                                  'type': _type}
 
-        dataTransport = self.DefaultRequest(url, customQueryParameters)
+        dataTransport = self.DefaultRequest(url, customQueryParameters, K_ENDPOINT_PLACES)
         if(dataTransport == None):
-            return []
+            return None
 
         return dataTransport['member']
\ No newline at end of file
@@ -1,19 +1,55 @@
-import codecs
+import json
 import logging
 import os
+import shutil
 import subprocess
-import time
 
 from datetime import datetime, timezone, timedelta
-from http.client import HTTPConnection
-from sys import platform
 
 from PIL import Image
 
-IsLaunchOnRaspberry = platform.startswith('linux')
+from lib.epdplatform import is_raspberry_pi
 
-if IsLaunchOnRaspberry:
-    import lib.epd5in83_V2 as EPaperLib
+IsLaunchOnRaspberry = is_raspberry_pi()
+
+DateTimeOffset = timedelta(0) #Shift of GetCurrentDateTime, used to replay recorded data
+
+EPaperLib = None #Imported on the first display, the SPI/GPIO libraries are slow to load on a Pi Zero
+
+def GetEPaperLib(_backend: str = 'auto', _frameFilename: str = None, _spiSpeedHz: int = None):
+    '''
+    Import the e-Paper driver on first use.
+    :param _backend: 'auto' for the display of the Raspberry Pi only, 'raspberrypi' to require it, 'simulated' to run the driver without hardware.
+    An explicit backend that can't be created raises an exception.
+    :param _frameFilename: file the simulated panel saves each displayed frame in.
+    :param _spiSpeedHz: SPI clock, the default clock of the driver if None.
+    :return: the driver module, or None if the display is not available
+    '''
+    global EPaperLib, IsLaunchOnRaspberry
+
+    if EPaperLib == None and (IsLaunchOnRaspberry or _backend != 'auto'):
+        try:
+            import lib.epdconfig as configModule
+            if _backend != 'auto':
+                implementation = configModule.create_implementation(_backend)
+                if _backend == 'simulated':
+                    implementation.realtime = True
+                    implementation.frame_filename = _frameFilename
+                    logging.info("Simulated ePaper, frames saved in %s", _frameFilename)
+                configModule.set_implementation(implementation)
+
+            if _spiSpeedHz != None:
+                configModule.implementation.max_speed_hz = _spiSpeedHz #Read by module_init
+
+            import lib.epd5in83_V2 as driverModule
+            EPaperLib = driverModule
+        except ImportError as e: #Raspberry Pi without the display libraries (spidev, RPi.GPIO)
+            if _backend != 'auto':
+                raise
+            logging.warning("ePaper driver unavailable, display disabled: %s", e)
+            IsLaunchOnRaspberry = False
+
+    return EPaperLib
 
 
 def AssertOnFile(_filename: str):
@@ -24,6 +60,17 @@ def AssertOnFile(_filename: str):
     '''
     assert os.path.exists(_filename), "{} doest not exist".format(_filename)
 
+def LoadConfig(_filename: str = 'config.json'):
+    '''
+    Load the configuration file
+    :param _filename: JSON configuration file.
+    :return: json dictionary
+    '''
+    AssertOnFile(_filename)
+
+    with open(_filename, 'r') as jsonConfig:
+        return json.load(jsonConfig)
+
 def SetupLogging(_logLevel: int):
     '''
     Defines and configures the logging level.
@@ -43,6 +90,8 @@ def SetupLogging(_logLevel: int):
     '''Switches on logging of the requests module.'''
     if _logLevel == logging.INFO:
         return
+
+    from http.client import HTTPConnection #Imports ssl, only needed to debug the requests
     HTTPConnection.debuglevel = 1
 
     requests_log = logging.getLogger("requests.packages.urllib3")
@@ -69,28 +118,31 @@ def GetCurrentDateTime():
     timezone_offset = 1.0  # London Standard Time (UTC+01:00)
     timezoneInfo = timezone(timedelta(hours=timezone_offset))
 
-    currentDateTime = datetime.now(timezoneInfo)
+    currentDateTime = datetime.now(timezoneInfo) + DateTimeOffset
     return currentDateTime.replace(tzinfo=None) #remove tzinfo to allow comparison between 2 offset-naive
 
+def SetCurrentDateTime(_dateTime: datetime):
+    '''
+    Shift the datetime returned by GetCurrentDateTime, the time keeps running from _dateTime.
+    :param _dateTime: offset-naive datetime to use as current datetime.
+    :return: None
+    '''
+    global DateTimeOffset
+    DateTimeOffset = timedelta(0)
+    DateTimeOffset = _dateTime - GetCurrentDateTime()
+
 def UpdateSVG(_templateSvgFilename: str, _outputSvgFilename: str, _inputDict: dict):
     '''
     Create an SVG file from a template by overwriting the default values.
+    The template is compiled at each call, keep a svg_template.SvgTemplate to render it several times.
     :param _templateSvgFilename: Reference template.
     :param _outputSvgFilename: name of the result
-    :param _inputDict:
+    :param _inputDict: placeholder as key, text as value
     :return: None
     '''
-    logging.info("Update %s", _outputSvgFilename)
-
-    AssertOnFile(_templateSvgFilename)
-
-    streamRead = codecs.open(_templateSvgFilename, 'r', encoding='UTF-8').read()
+    from svg_template import SvgTemplate
 
-    for output_key in _inputDict:
-        streamRead = streamRead.replace(output_key, _inputDict[output_key], 1)
-        logging.debug("Replaces \"{}\" to \"{}\"".format(output_key, _inputDict[output_key]))
-
-    codecs.open(_outputSvgFilename, 'w', encoding='UTF-8').write(streamRead)
+    SvgTemplate(_templateSvgFilename).Write(_outputSvgFilename, _inputDict)
 
 
 def ConvertSVG(_svgFilename: str, _outputFilename: str):
@@ -100,7 +152,8 @@ def ConvertSVG(_svgFilename: str, _outputFilename: str):
     :param _outputFilename: name of the converted file
     :return: None
     '''
-    if not IsLaunchOnRaspberry:
+    if shutil.which('inkscape') == None:
+        logging.warning("Inkscape not found, {} is not converted".format(_svgFilename))
         return
 
     AssertOnFile(_svgFilename)
@@ -114,33 +167,72 @@ def ConvertSVG(_svgFilename: str, _outputFilename: str):
     except subprocess.CalledProcessError as e:
         logging.debug(e.output)
 
-def DisplayOnEPaper(_filename: str):
+class EPaperSession:
     '''
-    Display a png/jpg/bmp image to th e-ink screen
-    :param _filename: filename to display
-    :return: None
+    Long-lived e-Paper display, keeps the driver between the refreshes.
+    The panel is only powered off (light sleep) when the next refresh is close, the SPI/GPIO module stays open.
+    It goes to deep sleep otherwise, EPD.sleep releases the module and the next refresh initializes it again.
     '''
-
-    logging.info("Display %s on ePaper", _filename)
-    if not IsLaunchOnRaspberry:
-        return
-
-    AssertOnFile(_filename)
-    assert _filename.lower().endswith(('.png', '.jpg', '.bmp')), "{} is not a PNG, JPG or BMP file"
-
-    Himage = Image.open(_filename)
-
-    ePaperDriver = EPaperLib.EPD()
-    ePaperDriver.init()
-
-    logging.info("Display image file on screen")
-    ePaperDriver.display(ePaperDriver.getbuffer(Himage))
-    ePaperDriver.sleep()
+    def __init__(self, _deepSleepThreshold: float, _backend: str = 'auto', _frameFilename: str = None, _spiSpeedHz: int = None):
+        '''
+        :param _deepSleepThreshold: minimum time in seconds until the next refresh to go to deep sleep.
+        :param _backend: hardware backend of the driver, see GetEPaperLib.
+        :param _frameFilename: file the simulated panel saves each displayed frame in.
+        :param _spiSpeedHz: SPI clock, the default clock of the driver if None.
+        '''
+        self.m_DeepSleepThreshold = _deepSleepThreshold
+        self.m_Backend = _backend
+        self.m_FrameFilename = _frameFilename
+        self.m_SpiSpeedHz = _spiSpeedHz
+        self.m_Driver = None
+        self.b_IsDeepSleep = True
+
+    def Display(self, _image: Image.Image, _nextRefreshDelay: float):
+        '''
+        Display an image to the e-ink screen and put it to sleep.
+        :param _image: Image to display
+        :param _nextRefreshDelay: time in seconds until the next refresh, choose between light and deep sleep.
+        :return: None
+        '''
+        logging.info("Display image on ePaper")
+        if GetEPaperLib(self.m_Backend, self.m_FrameFilename, self.m_SpiSpeedHz) == None:
+            return
+
+        if self.m_Driver == None:
+            self.m_Driver = EPaperLib.EPD()
+
+        if self.b_IsDeepSleep:
+            self.m_Driver.init() #Hardware reset is needed to wake up from deep sleep
+        else:
+            self.m_Driver.power_on()
+
+        logging.info("Display image file on screen")
+        self.m_Driver.display(self.m_Driver.getbuffer(_image))
+
+        self.b_IsDeepSleep = _nextRefreshDelay >= self.m_DeepSleepThreshold
+        if self.b_IsDeepSleep:
+            logging.debug("ePaper deep sleep")
+            self.m_Driver.sleep()
+        else:
+            logging.debug("ePaper power off")
+            self.m_Driver.power_off()
+
+    def Close(self):
+        '''
+        Put the screen in deep sleep, EPD.sleep also releases the SPI/GPIO module.
+        Nothing to do if the screen is already in deep sleep, its module was released at the same time.
+        :return: None
+        '''
+        if self.m_Driver == None or self.b_IsDeepSleep:
+            return
+
+        self.m_Driver.sleep()
+        self.b_IsDeepSleep = True
 
 def ClearEPaper():
     logging.info("Clear image on screen")
-    
-    if IsLaunchOnRaspberry:
+
+    if GetEPaperLib() == None:
         return
 
     ePaperDriver = EPaperLib.EPD()
@@ -149,32 +241,31 @@ def ClearEPaper():
     ePaperDriver.Clear()
     ePaperDriver.sleep()
 
-def MergeImages(_lhsFilename: str, _rhsFilename: str, _name: str, box = None):
+def LoadImage(_filename: str):
     '''
-    Pastes _rhsFilename image into _lhsFilename image.
-    :param _lhsFilename: Reference image.
-    :param _rhsFilename: Image to be copied.
-    :param _name: Saves this image under the given filename. If no format is specified, the format to use is determined from the filename extension, if possible.
-    :param box: An optional 4-tuple giving the region to paste into. If a 2-tuple is used instead, it’s treated as the upper left corner. If omitted or None, the source is pasted into the upper left corner
-    :return: None
+    Load a png/jpg/bmp image in memory.
+    :param _filename: filename to load
+    :return: Image class, the file is closed
     '''
+    AssertOnFile(_filename)
+    assert _filename.lower().endswith(('.png', '.jpg', '.bmp')), "{} is not a PNG, JPG or BMP file"
 
-    firstImg = Image.open(_lhsFilename)
-    secondImg = Image.open(_rhsFilename)
-
-    firstImg.paste(secondImg, box)
-    firstImg.save(_name)
+    with Image.open(_filename) as image:
+        image.load()
+        return image
 
-def AbbreviateMessage(_abbreviationsDict: dict, _value: str):
+def MergeImages(_lhsImage: Image.Image, _rhsImage: Image.Image, box = None):
     '''
-    Abbreviate a message from a dictionnary
-    :param _abbreviationsDict: Available abbreviations list.
-    :param _value: message to abbreviate
-    :return: The message in its abbreviated form.
+    Pastes _rhsImage into a copy of _lhsImage.
+    :param _lhsImage: Reference image, not modified.
+    :param _rhsImage: Image to be copied.
+    :param box: An optional 4-tuple giving the region to paste into. If a 2-tuple is used instead, it’s treated as the upper left corner. If omitted or None, the source is pasted into the upper left corner
+    :return: the merged Image
     '''
-    for key, value in _abbreviationsDict.items():
-        _value = _value.replace(key, value)
-    return _value
+
+    mergedImg = _lhsImage.copy()
+    mergedImg.paste(_rhsImage, box)
+    return mergedImg
 
 def Lerp(_startValue, _endValue, _value: float):
     '''
@@ -187,21 +278,3 @@ def Lerp(_startValue, _endValue, _value: float):
     _value = Clamp(_value, 0.0, 1.0)
     return (_startValue[0] * (1 - _value) + _endValue[0] * _value,
             _startValue[1] * (1 - _value) + _endValue[1] * _value)
-
-
-class Timer:
-    def __init__(self, _duration: float = 0.0):
-        self.m_StartTime = 0.0
-        self.m_Duration = _duration
-
-    def Reset(self):
-        self.m_StartTime = time.time()
-
-    def GetElapsedTime(self):
-        return abs(self.m_StartTime - time.time())
-
-    def GetRemainingTime(self):
-        return self.m_Duration - self.GetElapsedTime() 
-
-    def IsElapsed(self):
-        return self.GetElapsedTime() > self.m_Duration